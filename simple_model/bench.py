@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: simple_model.bench
+   :platform: Unix
+   :synopsis: Benchmarks for construction, serialization and comparison of v1 and v2 models.
+
+.. moduleauthor:: Aljosha Friemann a.friemann@automate.wtf
+
+Run with::
+
+    $ python -m simple_model.bench --output results.json
+    $ python -m simple_model.bench --compare results.json
+
+Results are written as JSON, so runs of different commits can be compared.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import timeit
+
+import simple_model
+
+from simple_model import v1, v2
+from simple_model.helpers import list_type
+
+
+SHAPES = {
+    'narrow-shallow': (4, 0),
+    'narrow-deep': (4, 3),
+    'wide-shallow': (64, 0),
+    'wide-deep': (64, 3),
+}
+
+LIST_LENGTH = 100
+
+
+def _value(index):
+    return ('value-%d' % index) if index % 2 else index
+
+
+def _type(index):
+    return str if index % 2 else int
+
+
+def payload(width, depth):
+    """A valid record for the models built by build_v1 and build_v2."""
+    data = dict(('field_%d' % i, _value(i)) for i in range(width))
+
+    if depth:
+        data['child'] = payload(width, depth - 1)
+        data['children'] = [payload(width, 0) for _ in range(2)]
+
+    return data
+
+
+def build_v1(width, depth):
+    """A v1 model with *width* attributes, nested *depth* levels deep."""
+    namespace = dict(('field_%d' % i, v1.Attribute(_type(i))) for i in range(width))
+
+    if depth:
+        namespace['child'] = v1.Attribute(build_v1(width, depth - 1))
+        namespace['children'] = v1.Attribute(list_type(build_v1(width, 0)))
+
+    return type('V1Depth%d' % depth, (v1.Model,), namespace)
+
+
+def build_v2(width, depth):
+    """A v2 model with *width* attributes, nested *depth* levels deep."""
+    model = type('V2Depth%d' % depth, (object,), {})
+
+    for i in reversed(range(width)):
+        model = v2.Attribute('field_%d' % i, type=_type(i))(model)
+
+    if depth:
+        model = v2.Attribute('children', type=list_type(build_v2(width, 0)))(model)
+        model = v2.Attribute('child', type=build_v2(width, depth - 1))(model)
+
+    return v2.Model()(model)
+
+
+def cases(filter=None):
+    """Yield (name, statement) tuples for every benchmark, optionally only those containing *filter*."""
+    for shape, (width, depth) in sorted(SHAPES.items()):
+        data = payload(width, depth)
+        invalid = dict(data, field_0='not a number')
+        records = [payload(width, 0) for _ in range(LIST_LENGTH)]
+
+        for version, build in (('v1', build_v1), ('v2', build_v2)):
+            model = build(width, depth)
+            leaves = list_type(build(width, 0))
+            first, second = model(**data), model(**data)
+
+            def construct(model=model, data=data):
+                return model(**data)
+
+            def serialize(first=first):
+                return dict(first)
+
+            def compare(first=first, second=second):
+                return first == second
+
+            def error(model=model, invalid=invalid):
+                try:
+                    model(**invalid)
+                except (ValueError, v2.ModelError):
+                    pass
+
+            def convert_list(leaves=leaves, records=records):
+                return leaves(records)
+
+            for operation, statement in (
+                    ('construct', construct),
+                    ('dict', serialize),
+                    ('eq', compare),
+                    ('error', error),
+                    ('list_type', convert_list)):
+                name = '%s/%s/%s' % (version, shape, operation)
+
+                if filter is None or filter in name:
+                    yield name, statement
+
+
+def _calibrate(timer):
+    try:
+        return timer.autorange()[0]
+    except AttributeError:
+        # python < 3.6
+        loops = 1
+
+        while timer.timeit(loops) < 0.2:
+            loops *= 10
+
+        return loops
+
+
+def run(filter=None, repeat=5, number=None):
+    """Run the benchmarks and return the results as a dictionary.
+
+    Without *number* every benchmark is calibrated to run for at least 0.2
+    seconds per repetition. The reported times are seconds per call.
+    """
+    results = {}
+
+    for name, statement in cases(filter):
+        timer = timeit.Timer(statement)
+        loops = number or _calibrate(timer)
+        timings = [t / loops for t in timer.repeat(repeat=repeat, number=loops)]
+
+        results[name] = {
+            'min': min(timings),
+            'median': sorted(timings)[len(timings) // 2],
+            'loops': loops,
+            'repeat': repeat,
+        }
+
+    return {
+        'simple_model': simple_model.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'results': results,
+    }
+
+
+def compare(baseline, current):
+    """Return (name, baseline, current, ratio) rows for benchmarks found in both runs, using the minimum."""
+    rows = []
+
+    for name, result in sorted(current['results'].items()):
+        if name in baseline['results']:
+            before = baseline['results'][name]['min']
+            rows.append((name, before, result['min'], result['min'] / before))
+
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m simple_model.bench',
+                                     description='Benchmark simple_model v1 and v2 models.')
+    parser.add_argument('-f', '--filter', help='only run benchmarks containing this string, e.g. "v2/wide"')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='number of repetitions (default: 5)')
+    parser.add_argument('-n', '--number', type=int, help='calls per repetition (default: calibrated)')
+    parser.add_argument('-o', '--output', help='write the results to this file instead of stdout')
+    parser.add_argument('-c', '--compare', metavar='BASELINE', help='compare with the results of an earlier run')
+
+    args = parser.parse_args(argv)
+
+    # v1 models log a warning for every failed attribute of the error benchmarks
+    logging.getLogger('simple_model').addHandler(logging.NullHandler())
+
+    current = run(args.filter, args.repeat, args.number)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(current, fp, indent=2, sort_keys=True)
+    elif not args.compare:
+        json.dump(current, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+
+        for name, before, after, ratio in compare(baseline, current):
+            sys.stdout.write('%-40s %12.3fus %12.3fus %8.2fx\n' % (name, before * 1e6, after * 1e6, ratio))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
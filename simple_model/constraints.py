@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: simple_model.constraints
+   :platform: Unix
+   :synopsis: Constraints for attribute values, fused into a single generated validator.
+
+.. moduleauthor:: Aljosha Friemann a.friemann@automate.wtf
+
+Every constraint can be used as an attribute type on its own. Combined with
+*fuse* or *&*, the conversions and constraints of an attribute are checked
+by one generated function instead of a chain of calls::
+
+    Attribute('port', type=fuse(int, in_range(1, 65535)))
+
+Constraints return the value unchanged and raise a ValueError naming the
+violated constraint otherwise. Error messages are only built on failure.
+"""
+
+import re
+
+try:
+    from enum import Enum
+except ImportError:
+    # python 2
+    Enum = None
+
+
+FORMATS = {
+    'date': r'\d{4}-\d{2}-\d{2}',
+    'time': r'\d{2}:\d{2}(:\d{2}(\.\d+)?)?',
+    'email': r'[^@\s]+@[^@\s]+\.[^@\s]+',
+    'hostname': r'(?=.{1,253}$)[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?(\.[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?)*',
+    'ipv4': r'((25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)\.){3}(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)',
+    'uuid': r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}',
+}
+
+
+class Constraint(object):
+    """Base class of constraints.
+
+    Subclasses implement *lines*, which returns the statements checking the
+    local variable *value*, and *message*, which describes a failure. The
+    generated code finds the constraint and anything returned by *namespace*
+    under names starting with the given prefix.
+    """
+
+    __validator = None
+
+    def lines(self, prefix):
+        raise NotImplementedError()
+
+    def namespace(self, prefix):
+        return {prefix: self}
+
+    def message(self, value):
+        raise NotImplementedError()
+
+    def __call__(self, value):
+        if self.__validator is None:
+            self.__validator = fuse(self)
+
+        return self.__validator(value)
+
+    def __and__(self, other):
+        return fuse(self, other)
+
+    def __rand__(self, other):
+        return fuse(other, self)
+
+
+class one_of(Constraint):
+    """The value has to be one of *values*, or of the values of an Enum class.
+
+    Hashable values are looked up in a frozenset, so the number of values does
+    not matter.
+    """
+
+    def __init__(self, *values):
+        if len(values) == 1 and Enum is not None and isinstance(values[0], type) and issubclass(values[0], Enum):
+            values = tuple(member.value for member in values[0])
+
+        self.values = values
+
+        try:
+            self.allowed = frozenset(values)
+        except TypeError:
+            self.allowed = values
+
+    def namespace(self, prefix):
+        return {prefix: self, prefix + '_allowed': self.allowed}
+
+    def lines(self, prefix):
+        return [
+            'try:',
+            '    valid = value in %s_allowed' % prefix,
+            'except TypeError:',
+            '    valid = False',
+            'if not valid:',
+            '    raise ValueError(%s.message(value))' % prefix,
+        ]
+
+    def message(self, value):
+        return 'must be one of {} but was \'{}\''.format(self.values, value)
+
+
+class _Bounds(Constraint):
+    def __init__(self, minimum=None, maximum=None):
+        if minimum is None and maximum is None:
+            raise ValueError('at least one of minimum and maximum is required')
+
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def bounds(self):
+        if self.maximum is None:
+            return 'at least {}'.format(self.minimum)
+        elif self.minimum is None:
+            return 'at most {}'.format(self.maximum)
+        else:
+            return 'between {} and {}'.format(self.minimum, self.maximum)
+
+    def namespace(self, prefix):
+        return {prefix: self, prefix + '_minimum': self.minimum, prefix + '_maximum': self.maximum}
+
+    def comparisons(self, expression, prefix):
+        comparisons = []
+
+        if self.minimum is not None:
+            comparisons.append('%s < %s_minimum' % (expression, prefix))
+
+        if self.maximum is not None:
+            comparisons.append('%s > %s_maximum' % (expression, prefix))
+
+        return [
+            'try:',
+            '    valid = not (%s)' % ' or '.join(comparisons),
+            'except TypeError:',
+            '    valid = False',
+            'if not valid:',
+            '    raise ValueError(%s.message(value))' % prefix,
+        ]
+
+
+class in_range(_Bounds):
+    """The value has to be at least *minimum* and at most *maximum*, either can be omitted."""
+
+    def lines(self, prefix):
+        return self.comparisons('value', prefix)
+
+    def message(self, value):
+        return 'must be {} but was {!r}'.format(self.bounds(), value)
+
+
+class length(_Bounds):
+    """The length of the value has to be at least *minimum* and at most *maximum*, either can be omitted."""
+
+    def lines(self, prefix):
+        return self.comparisons('len(value)', prefix)
+
+    def message(self, value):
+        try:
+            return 'length must be {} but was {}'.format(self.bounds(), len(value))
+        except TypeError:
+            return 'length must be {} but {!r} has no length'.format(self.bounds(), value)
+
+
+class matches(Constraint):
+    """The whole value has to match the regular expression *pattern*."""
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        # python 2 has no fullmatch
+        self.match = re.compile('(?:%s)\\Z' % pattern, flags).match
+
+    def namespace(self, prefix):
+        return {prefix: self, prefix + '_match': self.match}
+
+    def lines(self, prefix):
+        return [
+            'try:',
+            '    valid = %s_match(value) is not None' % prefix,
+            'except TypeError:',
+            '    valid = False',
+            'if not valid:',
+            '    raise ValueError(%s.message(value))' % prefix,
+        ]
+
+    def message(self, value):
+        return 'must match \'{}\' but was {!r}'.format(self.pattern, value)
+
+
+class string_format(matches):
+    """The value has to be a string of the format *name*, one of the keys of FORMATS."""
+
+    def __init__(self, name):
+        if name not in FORMATS:
+            raise ValueError('unknown format "%s"' % name)
+
+        super(string_format, self).__init__(FORMATS[name])
+
+        self.name = name
+
+    def message(self, value):
+        return 'must be a valid {} but was {!r}'.format(self.name, value)
+
+
+def fuse(*steps):
+    """Combine conversions and constraints into a single validator, applied in the given order.
+
+    Constraints are checked inline, any other callable converts the value,
+    like an attribute type does.
+    """
+    namespace = {}
+    lines = ['def validate(value):']
+
+    for index, step in enumerate(_flatten(steps)):
+        prefix = '_s%d' % index
+
+        if isinstance(step, Constraint):
+            namespace.update(step.namespace(prefix))
+            lines.extend('    ' + line for line in step.lines(prefix))
+        else:
+            namespace[prefix] = step
+            lines.append('    value = %s(value)' % prefix)
+
+    lines.append('    return value')
+
+    exec('\n'.join(lines), namespace)
+
+    validate = namespace['validate']
+    validate.__steps__ = tuple(_flatten(steps))
+
+    return validate
+
+
+def _flatten(steps):
+    for step in steps:
+        nested = getattr(step, '__steps__', None)
+
+        if nested is not None:
+            for nested_step in nested:
+                yield nested_step
+        else:
+            yield step
+
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
@@ -8,16 +8,111 @@
 
 """
 
+import array
+import threading
+
+from collections import OrderedDict
+
+from simple_model.constraints import one_of  # noqa: F401
+
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    # python 2
+    from collections import Sequence
+
+try:
+    _POSITIONAL = frozenset([str, unicode, bytes, int, long, float, bool, complex])  # noqa: F821
+except NameError:
+    _POSITIONAL = frozenset([str, bytes, int, float, bool, complex])
+
+_INTEGER_TYPECODES = 'bBhHiIlLqQ'
+_FLOAT_TYPECODES = 'fd'
+
+# marks the elements of a LazyList that have not been converted yet
+_MISSING = object()
+
 
 class list_type():
-    def __init__(self, t):
+    """Convert every element of a list with the type *t*.
+
+    Mappings and models are passed as keyword arguments and anything else as
+    a single argument. The convention is chosen once, with the first element:
+    if *t* rejects its keyword arguments with a TypeError but accepts the
+    mapping itself, all elements are passed as they are.
+
+    With a *typecode* the result is an array.array, which stores numbers far
+    more compactly than a list. With *lazy* the result is a LazyList, which
+    converts each element when it is accessed first.
+    """
+
+    def __init__(self, t, typecode=None, lazy=False):
+        if typecode is not None and lazy:
+            raise ValueError('a list_type can not both be lazy and have a typecode')
+
         self.__type__ = t
+        self.typecode = typecode
+        self.lazy = lazy
 
     def __call__(self, lst):
+        t = self.__type__
+
+        if self.typecode is not None:
+            try:
+                if (t is float and self.typecode in _FLOAT_TYPECODES) or (
+                        t is int and self.typecode in _INTEGER_TYPECODES):
+                    try:
+                        # array converts ints and floats itself, without a call per element
+                        return array.array(self.typecode, lst)
+                    except TypeError:
+                        pass
+
+                return array.array(self.typecode, map(t, lst))
+            except OverflowError as e:
+                # models only collect ValueErrors
+                raise ValueError(str(e))
+
+        if self.lazy:
+            return LazyList(self, lst)
+
+        elements = iter(lst)
+
+        for first in elements:
+            break
+        else:
+            return []
+
+        convert, first = self.convention(first)
+        result = [first]
+
+        if convert is t:
+            result.extend(map(t, elements))
+        else:
+            result.extend([t(**e) for e in elements])
+
+        return result
+
+    def convention(self, first):
+        """Return the function to convert elements with and the converted *first* element."""
+        t = self.__type__
+
+        # anything with keys can be unpacked as keyword arguments, models included
+        if t in _POSITIONAL or not hasattr(first, 'keys'):
+            return t, t(first)
+
+        try:
+            return self.keywords, t(**first)
+        except TypeError as e:
+            error = e
+
         try:
-            return [ self.__type__(**e) for e in lst ]
+            return t, t(first)
         except TypeError:
-            return [ self.__type__(e) for e in lst ]
+            raise error
+
+    def keywords(self, element):
+        return self.__type__(**element)
 
     def __repr__(self):
         return str({ 'list_type': self.__type__ })
@@ -26,11 +121,166 @@ class list_type():
         return self.__repr__()
 
 
-def one_of(*args):
-    def f(value):
-        if value not in args:
-            raise ValueError('must be one of {} but was \'{}\''.format(args, value))
-        return value
-    return f
+class LazyList(Sequence):
+    """A read only sequence converting its elements with a list_type when they are accessed first.
+
+    The list of values is copied, but the values themselves are not, so they
+    should not be changed until they are converted. Conversion errors are
+    raised on access. Pickling or copying converts all elements and results
+    in a plain list.
+    """
+
+    def __init__(self, list_type, values):
+        self.__values = list(values)
+        self.__items = [_MISSING] * len(self.__values)
+        self.__list_type = list_type
+        self.__convert = None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        item = self.__items[index]
+
+        if item is _MISSING:
+            if self.__convert is None:
+                self.__convert, item = self.__list_type.convention(self.__values[index])
+            else:
+                item = self.__convert(self.__values[index])
+
+            self.__items[index] = item
+            self.__values[index] = None
+
+        return item
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __iter__(self):
+        for index in range(len(self.__items)):
+            yield self[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, LazyList)):
+            return len(self) == len(other) and list(self) == list(other)
+
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class LRUCache(object):
+    """A thread safe mapping that keeps the *maxsize* most recently used entries.
+
+    Counts hits and misses of *get*, so callers can check if caching pays off.
+    """
+
+    def __init__(self, maxsize=128):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self.__data = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            try:
+                value = self.__data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.__data[key] = value
+            self.hits += 1
+
+            return value
+
+    def set(self, key, value):
+        with self.__lock:
+            self.__data.pop(key, None)
+            self.__data[key] = value
+
+            if len(self.__data) > self.maxsize:
+                self.__data.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __repr__(self):
+        return 'LRUCache(maxsize={}, size={}, hits={}, misses={})'.format(
+            self.maxsize, len(self), self.hits, self.misses
+        )
+
+
+class InternTable(object):
+    """Keeps one instance of every distinct value, so equal values can share it.
+
+    Calling the table returns the kept instance equal to the value, or keeps
+    the value if it is new. Once *maxsize* values are kept, new values are
+    returned as they are. Values that can not be hashed are never kept.
+    """
+
+    def __init__(self, maxsize=None):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.maxsize = maxsize
+
+        self.__data = {}
+        self.__lock = threading.Lock()
+
+    def __call__(self, value):
+        try:
+            key = _intern_key(value)
+            return self.__data[key]
+        except KeyError:
+            pass
+        except TypeError:
+            return value
+
+        with self.__lock:
+            if self.maxsize is None or len(self.__data) < self.maxsize:
+                return self.__data.setdefault(key, value)
+
+        return self.__data.get(key, value)
+
+    def clear(self):
+        with self.__lock:
+            self.__data.clear()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __repr__(self):
+        return 'InternTable(maxsize={}, size={})'.format(self.maxsize, len(self))
+
+
+def _intern_key(value):
+    # 1, 1.0 and True are equal, but must not replace each other, not even inside tuples
+    if type(value) is tuple:
+        return tuple, tuple(_intern_key(v) for v in value)
+
+    return type(value), value
 
 # vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: simple_model.parallel
+   :platform: Unix
+   :synopsis: Build large batches of v2 models in a pool of processes.
+
+.. moduleauthor:: Aljosha Friemann a.friemann@automate.wtf
+
+"""
+
+import itertools
+import multiprocessing
+import pickle
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    # python 2 without the futures backport
+    ProcessPoolExecutor = None
+
+from simple_model.v2 import Attribute, BatchModelError, ModelError, _error
+
+
+def validate_many(model, records, workers=None, chunk_size=None, as_dict=False, executor=None):
+    """Create instances of *model* from an iterable of dictionaries, using *workers* processes.
+
+    The records are split into chunks of *chunk_size*, by default about four
+    chunks per worker, and every chunk is built with model.from_records in a
+    worker process. The results are returned in input order, as dictionaries
+    from to_dict if *as_dict* is set, which saves pickling the instances.
+
+    As with from_records, all failures are collected and raised as a single
+    BatchModelError holding the index of every failed record.
+
+    *model* and the types of its attributes are sent to the workers by
+    reference, so they have to be importable from a module. An existing
+    executor can be passed to avoid starting a new pool on every call.
+    """
+    if executor is None:
+        if ProcessPoolExecutor is None:
+            raise RuntimeError('validate_many requires concurrent.futures')
+
+        with ProcessPoolExecutor(workers) as executor:
+            return validate_many(model, records, workers, chunk_size, as_dict, executor)
+
+    if chunk_size is None:
+        try:
+            chunk_size = max(1, -(-len(records) // (4 * (workers or multiprocessing.cpu_count()))))
+        except TypeError:
+            chunk_size = 1024
+
+    futures = []
+    offset = 0
+
+    for chunk in _chunks(records, chunk_size):
+        futures.append(executor.submit(_build, model, offset, chunk, as_dict))
+        offset += len(chunk)
+
+    instances = []
+    errors = []
+
+    for future in futures:
+        built, failed = future.result()
+
+        instances.extend(built)
+        errors.extend(
+            (index, ModelError(error.args[0], [_restore(model, arg) for arg in error.args[1]]))
+            for index, error in failed
+        )
+
+    if errors:
+        raise BatchModelError(model.__name__, errors)
+
+    return instances
+
+
+def _chunks(records, size):
+    records = iter(records)
+
+    while True:
+        chunk = list(itertools.islice(records, size))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def _build(model, offset, records, as_dict):
+    """Build a chunk in a worker, returning (instances, errors) with indices of the whole batch.
+
+    Attributes can not always be pickled, so errors refer to them by name.
+    """
+    try:
+        instances = model.from_records(records)
+    except BatchModelError as e:
+        return [], [
+            (offset + index, ModelError(error.args[0], [_portable(arg) for arg in error.args[1]]))
+            for index, error in e.args[1]
+        ]
+
+    if as_dict:
+        instances = [instance.to_dict() for instance in instances]
+
+    return instances, []
+
+
+class _AttributeName(str):
+    """The name of an attribute standing in for it in the arguments of a portable exception."""
+
+
+def _portable(error):
+    attribute, value, exception = error.args
+
+    return AttributeError(attribute.name if attribute is not None else None, value, _portable_exception(exception))
+
+
+def _portable_exception(exception):
+    """Replace attributes in the arguments of *exception* by their names.
+
+    Exceptions that still can not be pickled are replaced by a ValueError with their message.
+    """
+    if not isinstance(exception, BaseException):
+        return exception
+
+    args = tuple(_AttributeName(arg.name) if isinstance(arg, Attribute) else arg for arg in exception.args)
+
+    try:
+        portable = exception.__class__(*args)
+        pickle.dumps(portable)
+    except Exception:
+        return ValueError('{0}: {1}'.format(exception.__class__.__name__, exception))
+
+    return portable
+
+
+def _restore(model, error):
+    name, value, exception = error.args
+
+    if isinstance(exception, BaseException):
+        exception.args = tuple(
+            model.__schema__.names.get(arg, arg) if isinstance(arg, _AttributeName) else arg for arg in exception.args
+        )
+
+    return _error(model.__schema__.names.get(name), value, exception)
+
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
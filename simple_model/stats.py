@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: simple_model.stats
+   :platform: Unix
+   :synopsis: Opt-in counters and timings for v2 models.
+
+.. moduleauthor:: Aljosha Friemann a.friemann@automate.wtf
+
+While disabled, models run their normal generated constructors and nothing
+is recorded. enable() swaps in constructors that count and time every
+construction per model class and every parsed value per attribute::
+
+    from simple_model import stats
+
+    stats.enable()
+    ...
+    for model, counters in stats.snapshot().items():
+        print(model.__name__, counters['count'], counters['time'])
+
+Counters are not synchronized, increments from concurrent threads may get lost.
+"""
+
+import time
+import weakref
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    # python 2
+    clock = time.time
+
+
+enabled = False
+
+_BUCKETS = 32
+
+_models = weakref.WeakKeyDictionary()
+
+
+class AttributeStats(object):
+    """Counters of a single attribute of a model class, times are in seconds.
+
+    *parse_time* does not include *copy_time*, the time spent copying values
+    before parsing them.
+    """
+
+    __slots__ = ('count', 'defaults', 'failures', 'parse_time', 'copy_time', 'transform_time')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.defaults = 0
+        self.failures = 0
+        self.parse_time = 0.0
+        self.copy_time = 0.0
+        self.transform_time = 0.0
+
+    def timed(self, copier):
+        """Wrap *copier* to add the time it takes to *copy_time*."""
+        def timed_copier(value):
+            start = clock()
+
+            try:
+                return copier(value)
+            finally:
+                self.copy_time += clock() - start
+
+        return timed_copier
+
+    def snapshot(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+
+class ModelStats(object):
+    """Counters of a model class and its attributes, times are in seconds.
+
+    The histogram counts constructions by their duration in powers of two
+    microseconds, bucket *n* holds those taking less than 2 ** n microseconds.
+    """
+
+    def __init__(self):
+        self.attributes = {}
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.failures = 0
+        self.time = 0.0
+        self.buckets = [0] * _BUCKETS
+
+        for attribute in self.attributes.values():
+            attribute.reset()
+
+    def attribute(self, name):
+        try:
+            return self.attributes[name]
+        except KeyError:
+            return self.attributes.setdefault(name, AttributeStats())
+
+    def record(self, elapsed, failed=False):
+        self.count += 1
+        self.time += elapsed
+        self.buckets[min(int(elapsed * 1e6).bit_length(), _BUCKETS - 1)] += 1
+
+        if failed:
+            self.failures += 1
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'time': self.time,
+            'histogram': dict((2 ** n, count) for n, count in enumerate(self.buckets) if count),
+            'attributes': dict((name, a.snapshot()) for name, a in self.attributes.items()),
+        }
+
+
+def model(cls):
+    """Return the ModelStats of the model class *cls*, creating them if necessary."""
+    try:
+        return _models[cls]
+    except KeyError:
+        return _models.setdefault(cls, ModelStats())
+
+
+def enable():
+    """Start recording, the constructors of all v2 models are replaced with instrumented ones."""
+    global enabled
+
+    if not enabled:
+        enabled = True
+        _instrument(True)
+
+
+def disable():
+    """Stop recording and restore the plain constructors, the counters are kept."""
+    global enabled
+
+    if enabled:
+        enabled = False
+        _instrument(False)
+
+
+def reset():
+    """Set all counters back to zero."""
+    for stats in list(_models.values()):
+        stats.reset()
+
+
+def snapshot():
+    """Return the counters of every model class that recorded anything, as plain dictionaries.
+
+    The keys are the model classes::
+
+        {Model: {'count': 2, 'failures': 0, 'time': 3.1e-05, 'histogram': {16: 2},
+                 'attributes': {'foo': {'count': 2, 'defaults': 0, 'failures': 0, ...}}}}
+    """
+    return dict(
+        (cls, stats.snapshot()) for cls, stats in list(_models.items())
+        if stats.count or any(a.count or a.failures for a in stats.attributes.values())
+    )
+
+
+def _instrument(instrumented):
+    from simple_model import v2
+
+    v2._instrument(instrumented)
+
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: simple_model.stream
+   :platform: Unix
+   :synopsis: Load models lazily from NDJSON or JSON array files.
+
+.. moduleauthor:: Aljosha Friemann a.friemann@automate.wtf
+
+"""
+
+import codecs
+import io
+import itertools
+import json
+
+from simple_model.v2 import ModelError
+
+
+_WHITESPACE = ' \t\n\r'
+
+
+def load(model, source, errors=None, chunk_size=65536, encoding='utf-8'):
+    """Yield instances of *model* from a file containing NDJSON or a top-level JSON array.
+
+    *source* is either a path or a file object opened in text or binary mode.
+    The file is read in chunks of *chunk_size*, so memory use only depends on
+    the size of a single record.
+
+    By default the first invalid record raises. If a list is passed as
+    *errors*, every failure is appended to it as a (line, exception) tuple and
+    loading continues with the next record. The line is the one the record
+    starts on, counting from 1. Unknown keys that the model does not drop and
+    no custom __init__ takes raise a TypeError, which is collected as well.
+    """
+    if isinstance(source, (str, bytes)) or not hasattr(source, 'read'):
+        with io.open(source, 'rb') as fp:
+            for instance in load(model, fp, errors, chunk_size, encoding):
+                yield instance
+        return
+
+    chunks = _chunks(source, chunk_size, encoding)
+    first = ''
+
+    for chunk in chunks:
+        first += chunk
+
+        if first.strip(_WHITESPACE):
+            break
+    else:
+        return
+
+    if first.lstrip(_WHITESPACE).startswith('['):
+        records = _array(first, chunks)
+    else:
+        records = _lines(first, chunks)
+
+    for line, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            elif not isinstance(record, dict):
+                raise ValueError('expected a JSON object but got %s' % type(record).__name__)
+
+            yield model(**record)
+        except (ModelError, TypeError, ValueError) as e:
+            if errors is None:
+                raise
+
+            errors.append((line, e))
+
+
+def _chunks(fp, chunk_size, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)()
+
+    while True:
+        chunk = fp.read(chunk_size)
+
+        if not chunk:
+            break
+        elif isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+
+        if chunk:
+            yield chunk
+
+    rest = decoder.decode(b'', final=True)
+
+    if rest:
+        yield rest
+
+
+def _lines(buffer, chunks):
+    """Yield (line, record) tuples from NDJSON, invalid JSON is yielded as the exception."""
+    chunks = itertools.chain([buffer], chunks)
+    buffer = ''
+    number = 0
+
+    def parse(line):
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            return e
+
+    for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split('\n')
+        buffer = lines.pop()
+
+        for line in lines:
+            number += 1
+
+            if line.strip(_WHITESPACE):
+                yield number, parse(line)
+
+    number += 1
+
+    if buffer.strip(_WHITESPACE):
+        yield number, parse(buffer)
+
+
+def _array(buffer, chunks):
+    """Yield (line, record) tuples from the elements of a JSON array."""
+    decoder = json.JSONDecoder()
+    position = buffer.index('[') + 1
+    line = 1 + buffer.count('\n', 0, position)
+    mark = position
+    expect = ']value'
+
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE:
+            position += 1
+
+        if position == len(buffer):
+            buffer, position, mark, line = _extend(buffer, position, mark, line, chunks)
+
+            if buffer is None:
+                raise ValueError('unterminated JSON array')
+
+            continue
+
+        char = buffer[position]
+
+        if char == ']' and expect != 'value':
+            return
+        elif expect == ',]':
+            if char != ',':
+                raise ValueError('expected "," or "]" at line %d' % (line + buffer.count('\n', mark, position)))
+
+            position += 1
+            expect = 'value'
+            continue
+
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            end = None
+
+        # the element might continue in the next chunk
+        if end is None or end == len(buffer):
+            extended = _extend(buffer, position, mark, line, chunks)
+
+            if extended[0] is not None:
+                buffer, position, mark, line = extended
+                continue
+            elif end is None:
+                raise ValueError('invalid JSON at line %d' % (line + buffer.count('\n', mark, position)))
+
+        line += buffer.count('\n', mark, position)
+        mark = position
+
+        yield line, record
+
+        position = end
+        expect = ',]'
+
+
+def _extend(buffer, position, mark, line, chunks):
+    """Drop the consumed part of *buffer* and append the next chunk."""
+    try:
+        chunk = next(chunks)
+    except StopIteration:
+        return None, position, mark, line
+
+    line += buffer.count('\n', mark, position)
+
+    return buffer[position:] + chunk, 0, 0, line
+
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
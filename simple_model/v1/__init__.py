@@ -9,7 +9,7 @@
 
 """
 
-from simple_model.v1.model import Model
+from simple_model.v1.model import Model, FailedAttribute, UnknownKey
 from simple_model.v1.attribute import Attribute
 
 # vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
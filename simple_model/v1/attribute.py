@@ -42,6 +42,12 @@ class Attribute(object):
         self.value = value
         return self
 
+    def copy(self):
+        """Return a shallow copy, which is enough to hold a value independently of this Attribute."""
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        return clone
+
     @property
     def alias(self):
         return self.__alias__
@@ -56,22 +62,26 @@ class Attribute(object):
 
     @value.setter
     def value(self, value):
+        self.__value__ = self.parse(value)
+
+    def parse(self, value):
+        """Convert *value* to the type of this Attribute, without storing it."""
         if value is None:
             if self.__default__ is not None:
                 try:
-                    self.__value__ = self.__type__(self.__default__())
+                    return self.__type__(self.__default__())
                 except TypeError:
-                    self.__value__ = self.__type__(self.__default__)
+                    return self.__type__(self.__default__)
             elif self.__optional__:
-                self.__value__ = None
+                return None
             else:
                 raise ValueError('attribute value must not be None')
         elif type(value) is self.__type__:
-            self.__value__ = value
+            return value
         else:
             try:
-                self.__value__ = self.__type__(**value)
+                return self.__type__(**value)
             except TypeError:
-                self.__value__ = self.__type__(value)
+                return self.__type__(value)
 
 # vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
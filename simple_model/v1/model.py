@@ -8,48 +8,200 @@
 """
 
 import abc
+import array
 import logging
 import copy
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from simple_model.helpers import LazyList
 from simple_model.v1.attribute import Attribute
 
 
-class Model(object):
-    __metaclass__ = abc.ABCMeta
+class FailedAttribute(Mapping):
+    """An Attribute that could not be parsed, as raised in the ValueError of a Model.
+
+    Reads like a dictionary of strings with the keys key, attribute, value and
+    exception, which are only formatted when they are accessed or printed.
+    """
+
+    __slots__ = ('name', 'attribute', 'value', 'exception')
+
+    __keys__ = ('key', 'attribute', 'value', 'exception')
+
+    def __init__(self, name, attribute, value, exception):
+        self.name = name
+        self.attribute = attribute
+        self.value = value
+        self.exception = exception
+
+    def __getitem__(self, item):
+        if item == 'key':
+            return str(self.name)
+        elif item == 'attribute':
+            return str(self.attribute)
+        elif item == 'value':
+            return str(self.value)
+        elif item == 'exception':
+            return '{0}: {1}'.format(self.exception.__class__.__name__, str(self.exception))
+
+        raise KeyError(item)
+
+    def __iter__(self):
+        return iter(self.__keys__)
+
+    def __len__(self):
+        return len(self.__keys__)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __str__(self):
+        return str(dict(self))
+
+
+class UnknownKey(object):
+    """An unknown key passed to a Model, formatted only when it is printed."""
+
+    __slots__ = ('key', 'value')
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+    def __eq__(self, other):
+        return str(self) == other if isinstance(other, str) else (
+            isinstance(other, UnknownKey) and (self.key, self.value) == (other.key, other.value)
+        )
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __str__(self):
+        return 'Unknown key "{}" with value "{}"'.format(self.key, self.value)
+
+
+class Field(object):
+    """Data descriptor standing in for an Attribute on a Model class.
+
+    Instances keep the parsed value in their __dict__ under the same key, so
+    reading and writing attributes does not need to go through Model hooks.
+    Accessing the Field on the class returns the Attribute it was declared with.
+    """
+
+    __slots__ = ('key', 'attribute')
+
+    def __init__(self, key, attribute):
+        self.key = key
+        self.attribute = attribute
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self.attribute
 
+        try:
+            return obj.__dict__[self.key]
+        except KeyError:
+            return self.attribute.value
+
+    def __set__(self, obj, value):
+        if self.__get__(obj) == value:
+            return
+        elif not obj.__mutable__:
+            raise AttributeError('Model is immutable')
+
+        obj.__dict__[self.key] = self.attribute.parse(value)
+
+
+class ModelMeta(abc.ABCMeta):
+    """Finds the Attributes of a Model class once, when the class is created.
+
+    The attributes are kept in __fields__ as (key, attribute) tuples sorted by
+    key, their keys in __field_keys__. Attributes declared on the class itself
+    are replaced by a Field descriptor.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super(ModelMeta, cls).__init__(name, bases, namespace)
+        type.__setattr__(cls, '__logger__', logging.getLogger(__package__ + '.' + name))
+        cls.__discover__()
+
+    def __discover__(cls):
+        fields = []
+
+        for key in dir(cls):
+            if key != 'attributes' and not key.startswith('_'):
+                value = getattr(cls, key, None)
+
+                if issubclass(type(value), Attribute):
+                    fields.append((key, value))
+
+                    if cls.__dict__.get(key) is value:
+                        type.__setattr__(cls, key, Field(key, value))
+
+        type.__setattr__(cls, '__fields__', tuple(fields))
+        type.__setattr__(cls, '__field_keys__', frozenset(key for key, _ in fields))
+
+        for subclass in cls.__subclasses__():
+            subclass.__discover__()
+
+    def __setattr__(cls, name, value):
+        super(ModelMeta, cls).__setattr__(name, value)
+
+        if issubclass(type(value), Attribute) or name in getattr(cls, '__field_keys__', ()):
+            cls.__discover__()
+
+    def __delattr__(cls, name):
+        super(ModelMeta, cls).__delattr__(name)
+
+        if name in getattr(cls, '__field_keys__', ()):
+            cls.__discover__()
+
+
+# works with the metaclass syntax of python 2 and 3
+_ModelBase = ModelMeta('_ModelBase', (object,), {})
+
+
+class Model(_ModelBase):
     __hide_unset__ = False
     __ignore_unknown__ = True
     __mutable__ = True
 
     @property
     def attributes(self):
-        for key in dir(self):
-            if key != 'attributes' and not key.startswith('_'):
-                value = object.__getattribute__(self, key)
-
-                if issubclass(type(value), Attribute):
-                    yield key, copy.deepcopy(value)
+        for key, declaration in self.__fields__:
+            attribute = declaration.copy()
+            attribute.__value__ = copy.deepcopy(getattr(self, key))
+            yield key, attribute
 
     def __iter__(self):
-        for key, attribute in self.attributes:
+        values = self.__dict__
+
+        for key, attribute in self.__fields__:
             name = attribute.name or key
+            value = values[key] if key in values else attribute.value
 
-            if attribute.value is None and self.__hide_unset__:
+            if value is None and self.__hide_unset__:
                 continue
-            elif isinstance(attribute.value, list):
-                value = [ dict(v) if isinstance(v, Model) else v for v in attribute.value ]
-            elif isinstance(attribute.value, Model):
-                value = dict(attribute.value)
-            else:
-                value = attribute.value
+            elif isinstance(value, (list, LazyList)):
+                value = [ dict(v) if isinstance(v, Model) else v for v in value ]
+            elif isinstance(value, array.array):
+                value = value.tolist()
+            elif isinstance(value, Model):
+                value = dict(value)
 
             yield name, value
 
     def __contains__(self, item):
-        for key, _ in self.attributes:
-            if key == item:
-                return True
-        return False
+        return item in self.__field_keys__
 
     def __eq__(self, other):
         return (isinstance(other, self.__class__) and dict(self) == dict(other))
@@ -58,35 +210,30 @@ class Model(object):
         return not self.__eq__(other)
 
     def __init__(self, **kwargs):
-        logger = logging.getLogger(__package__ + '.' + self.__class__.__name__)
+        logger = self.__logger__
+        debug = logger.isEnabledFor(logging.DEBUG)
 
         failed_values = []
 
-        for key, attribute in self.attributes:
+        values = self.__dict__
+
+        for key, attribute in self.__fields__:
             name = attribute.name or key
             value = kwargs.get(name, kwargs.get(key, kwargs.get(attribute.alias)))
 
-            logger.debug('[{}] parsing attribute {} with value "{}"'.format(name, attribute, value))
+            if debug:
+                logger.debug('[%s] parsing attribute %s with value "%s"', name, attribute, value)
 
             try:
-                attribute.value = value
-                object.__setattr__(self, key, attribute)
+                values[key] = attribute.parse(value)
             except Exception as e:
-                logger.warning('[{}] failed to parse value "{}" with {}'.format(name, value, attribute))
+                logger.warning('[%s] failed to parse value "%s" with %s', name, value, attribute)
 
-                failed_values.append(
-                    {
-                        'key': str(name),
-                        'attribute': str(attribute),
-                        'value': str(value),
-                        'exception': '{0}: {1}'.format(e.__class__.__name__, str(e))
-                    }
-                )
+                failed_values.append(FailedAttribute(name, attribute, value, e))
 
         if not self.__ignore_unknown__:
             failed_values.extend([
-                'Unknown key "{}" with value "{}"'.format(key, value)
-                for key, value in kwargs.items() if key not in self
+                UnknownKey(key, value) for key, value in kwargs.items() if key not in self
             ])
 
         if len(failed_values) != 0:
@@ -98,29 +245,5 @@ class Model(object):
     def __str__(self):
         return str(dict(self))
 
-    def __getattribute__(self, name):
-        attr = object.__getattribute__(self, name)
-        if issubclass(type(attr), Attribute):
-            return attr.value
-        else:
-            return attr
-
-    def __setattr__(self, name, value):
-        try:
-            obj = object.__getattribute__(self, name)
-        except AttributeError:
-            obj = None
-
-        if issubclass(type(obj), Attribute):
-            if obj.value == value:
-                return
-            elif not self.__mutable__:
-                raise AttributeError('Model is immutable')
-
-            obj.value = value
-            value = obj
-
-        object.__setattr__(self, name, value)
-
 
 # vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
@@ -1,10 +1,39 @@
 # -*- coding: utf-8 -*-
 
+import array
 import copy
+import inspect
+import itertools
+import json
+import re
+import weakref
+
+from collections import OrderedDict
+
+from simple_model import stats as _stats
+from simple_model.helpers import list_type, InternTable, LazyList, LRUCache
 
 
 Unset = Ellipsis
 
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+try:
+    _SCALARS = frozenset([str, unicode, bytes, int, long, float, bool, complex])  # noqa: F821
+except NameError:
+    _SCALARS = frozenset([str, bytes, int, float, bool, complex])
+
+_IMMUTABLE = _SCALARS.union([type(None), type(Unset)])
+
+# stored in place of the value of an attribute a lazy model has not parsed yet
+_Pending = object()
+
+# every decorated model, so simple_model.stats can swap their constructors
+_models = weakref.WeakSet()
+
+# python 2 has no coroutines
+_is_coroutine_function = getattr(inspect, 'iscoroutinefunction', lambda f: False)
+
 
 class ModelError(RuntimeError):
     def __str__(self):
@@ -21,84 +50,1149 @@ class ModelError(RuntimeError):
         )
 
 
+class BatchModelError(ModelError):
+    """Errors of several records, the arguments are the model name and a list of (index, ModelError) tuples."""
+
+    def __str__(self):
+        def format_error(index, error):
+            return '- record: {}\n{}'.format(index, '\n'.join(
+                '  ' + line for line in str(error).split('\n')[1:]
+            ))
+
+        return '{name}\n{errors}'.format(
+            name=self.args[0],
+            errors='\n'.join(
+                format_error(index, error) for index, error in self.args[1]
+            )
+        )
+
+
+def _error(attribute, value, exception):
+    error = AttributeError(attribute, value, exception)
+    error.__cause__ = None
+    return error
+
+
+def _identity(value):
+    return value
+
+
+def _is_identifier(name):
+    return _IDENTIFIER.match(name) is not None
+
+
+def _read(attribute, lazy=False, obj='self'):
+    """Generate the expression reading the value of *attribute* from *obj*.
+
+    Lazy models have to go through the property, which parses pending values.
+    """
+    name = attribute.name if lazy else attribute.value_name
+
+    if _is_identifier(name):
+        return '%s.%s' % (obj, name)
+    else:
+        return '_getattr(%s, %r)' % (obj, name)
+
+
+def _asynchronous_lines(model, indent):
+    """Generate the statement refusing to build *model* synchronously, if it has coroutine types or transformations.
+
+    Their results would have to be awaited, so these models are only created with acreate.
+    """
+    names = [attribute.name for attribute in model.__schema__ if attribute.asynchronous]
+
+    if not names:
+        return []
+
+    return [' ' * indent + 'raise TypeError(%r)' % (
+        '%s has coroutine types or transformations (%s), create it with acreate' % (model.__name__, ', '.join(names))
+    )]
+
+
+def _user_init(model):
+    """Return the __init__ the generated constructor should chain to.
+
+    Generated constructors remember the __init__ they replaced, so a decorated
+    subclass chains to the user defined __init__ of its parent instead of
+    running the parent's attribute handling a second time.
+    """
+    init = getattr(model, '__init__', None)
+    init = getattr(init, '__func__', init)
+    return getattr(init, '__user_init__', init)
+
+
+def _is_model(t):
+    return isinstance(t, type) and isinstance(getattr(t, '__schema__', None), Schema)
+
+
+def _kind(attribute):
+    """Classify the values an attribute holds, for the generated serializer."""
+    if attribute.type in _SCALARS:
+        return 'scalar'
+    elif _is_model(attribute.type):
+        return 'model'
+    elif isinstance(attribute.type, list_type) and _is_model(attribute.type.__type__):
+        return 'models'
+    else:
+        return 'any'
+
+
+def _is_frozen(value):
+    return getattr(type(value).__hash__, '__frozen__', False)
+
+
+def _copy_auto(value):
+    """Deep copy *value* unless it can not be changed through the model anyway."""
+    t = type(value)
+
+    if t in _IMMUTABLE or _is_frozen(value):
+        return value
+    elif (t is tuple or t is frozenset) and all(type(v) in _IMMUTABLE for v in value):
+        return value
+
+    return copy.deepcopy(value)
+
+
+def _copy_shallow(value):
+    if type(value) in _IMMUTABLE:
+        return value
+
+    return copy.copy(value)
+
+
+def _copier(attribute, policy):
+    """Choose how values are copied before *attribute* parses them.
+
+    =========== ===========================================================
+    policy      copy
+    =========== ===========================================================
+    auto        only values the type would pass through unchanged, and
+                only if they are mutable
+    deep        every value, with copy.deepcopy
+    shallow     every mutable value, with copy.copy
+    none        nothing, like value_by_reference
+    =========== ===========================================================
+    """
+    if attribute.value_by_reference or policy == 'none':
+        return _identity
+    elif policy == 'deep':
+        return copy.deepcopy
+    elif policy == 'shallow':
+        return _copy_shallow
+
+    t = attribute.type
+
+    if _kind(attribute) in ('scalar', 'model') or (
+            isinstance(t, list_type) and not t.lazy and (t.__type__ in _SCALARS or _is_model(t.__type__))):
+        # these types build a new value, the input is only kept if it already has the right type
+        # lazy list_types keep the elements they are given, so they are copied like any other value
+        return lambda value: _copy_auto(value) if type(value) is t else value
+
+    return _copy_auto
+
+
+def _serialize(value, by_alias=True, hide_unset=None):
+    if _is_model(value.__class__):
+        return value.to_dict(by_alias, hide_unset)
+    elif isinstance(value, (list, tuple, LazyList)):
+        return [_serialize(v, by_alias, hide_unset) for v in value]
+    elif isinstance(value, array.array):
+        return value.tolist()
+    elif isinstance(value, dict):
+        return dict((k, _serialize(v, by_alias, hide_unset)) for k, v in value.items())
+    else:
+        return value
+
+
+def _json_default(value):
+    if value is Unset:
+        return None
+
+    raise TypeError('Object of type %s is not JSON serializable' % value.__class__.__name__)
+
+
+def _to_json(cls, by_alias=True, hide_unset=None, **kwargs):
+    """Serialize the model to a JSON string, unset attributes become null.
+
+    Additional keyword arguments are passed on to json.dumps.
+    """
+    default = kwargs.pop('default', None)
+
+    if default is None:
+        kwargs['default'] = _json_default
+    else:
+        kwargs['default'] = lambda value: None if value is Unset else default(value)
+
+    return json.dumps(cls.to_dict(by_alias, hide_unset), **kwargs)
+
+
+class Schema(object):
+    """The attributes of a model class, in declaration order and indexed by name and alias.
+
+    Built once when the class is decorated, so looking up attributes or keys
+    does not have to scan every attribute of the model.
+    """
+
+    def __init__(self, attributes):
+        self.attributes = tuple(attributes)
+        self.names = dict((a.name, a) for a in self.attributes)
+
+        self.index = dict((a.alias, a) for a in self.attributes if a.alias is not None)
+        self.index.update(self.names)
+
+        self.items = tuple(sorted(((a.alias or a.name, a) for a in self.attributes), key=lambda item: item[0]))
+        self.keys = tuple(key for key, _ in self.items)
+
+    @classmethod
+    def collect(cls, model):
+        """Gather the attributes declared on *model* and its bases, parents first."""
+        attributes = OrderedDict()
+
+        for klass in reversed(model.__mro__):
+            for attribute in klass.__dict__.get('__declared_attributes__', ()):
+                attributes[attribute.name] = attribute
+
+        return cls(attributes.values())
+
+    def __iter__(self):
+        return iter(self.attributes)
+
+    def __len__(self):
+        return len(self.attributes)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __getitem__(self, key):
+        return self.index[key]
+
+
+def _add_slots(model, extra=()):
+    """Recreate *model* with its attribute values stored in __slots__.
+
+    A class can not be given slots after it has been created, so this builds a
+    new class from the namespace of the old one, the same way dataclasses does.
+    """
+    inherited = set()
+
+    for base in model.__mro__[1:]:
+        inherited.update(base.__dict__.get('__slots__', ()))
+
+    slots = tuple(sorted(set(
+        a.value_name for a in model.__schema__ if a.value_name not in inherited
+    ).union(name for name in extra if name not in inherited)))
+
+    namespace = dict(model.__dict__)
+    namespace.pop('__dict__', None)
+    namespace.pop('__weakref__', None)
+
+    for name in slots:
+        namespace.pop(name, None)
+
+    namespace['__slots__'] = slots
+
+    slotted = type(model)(model.__name__, model.__bases__, namespace)
+
+    if hasattr(model, '__qualname__'):
+        slotted.__qualname__ = model.__qualname__
+
+    # methods using super() or __class__ refer to the old class through a closure cell
+    for value in namespace.values():
+        value = getattr(value, '__func__', value)
+
+        for cell in getattr(value, '__closure__', None) or ():
+            try:
+                if cell.cell_contents is model:
+                    cell.cell_contents = slotted
+            except (ValueError, AttributeError):
+                pass
+
+    return slotted
+
+
+def _is_unset(value):
+    return value is None or value is Unset
+
+
+def _unset_as_none(value):
+    return None if value is Unset else value
+
+
+def _contains(cls, key):
+    return not _is_unset(getattr(cls, key))
+
+
+def _read_only(cls, value=Unset):
+    raise AttributeError("can't set attribute")
+
+
+def _resolve(obj, attribute):
+    """Parse the value a lazy model stored for *attribute* and keep the result."""
+    raw = obj.__raw__.get(attribute.name, Unset)
+    copier = obj.__copiers__[attribute.name]
+
+    try:
+        if _stats.enabled:
+            value = _timed_convert(attribute, raw, copier, _stats.model(obj.__class__).attribute(attribute.name))
+        else:
+            value = attribute.convert(raw, copier)
+    except (AttributeError, ValueError) as e:
+        raise ModelError(obj.__class__.__name__, [_error(attribute, raw, e)])
+
+    setattr(obj, attribute.value_name, value)
+    obj.__raw__.pop(attribute.name, None)
+
+    return value
+
+
+def _timed_convert(attribute, value, copier, record):
+    """Attribute.convert, counting and timing each step in the AttributeStats *record*."""
+    try:
+        if value is Unset:
+            if attribute.default is not None:
+                value = attribute.default
+                record.defaults += 1
+            elif attribute.fdefault is not None:
+                value = attribute.fdefault()
+                record.defaults += 1
+
+        copied = record.copy_time
+        start = _stats.clock()
+
+        if type(attribute).parse is not Attribute.parse:
+            value = attribute.parse(value)
+        elif copier is None or copier is _identity:
+            value = attribute.parse(value, copier)
+        else:
+            value = attribute.parse(value, record.timed(copier))
+
+        parsed = _stats.clock()
+        record.parse_time += parsed - start - (record.copy_time - copied)
+
+        value = attribute.transformation(value)
+
+        if attribute.intern is not None:
+            value = attribute.intern(value)
+
+        record.transform_time += _stats.clock() - parsed
+    except (AttributeError, ValueError):
+        record.failures += 1
+        raise
+
+    record.count += 1
+
+    return value
+
+
+def _instrument(instrumented):
+    """Regenerate the constructors of all decorated models, with or without recording stats."""
+    for model in list(_models):
+        options = model.__dict__['__options__']
+
+        model.__init__ = options._make_init(model, instrumented)
+
+        from_records = getattr(model.__dict__.get('from_records'), '__func__', None)
+
+        if getattr(from_records, '__generated__', False):
+            model.from_records = options._make_from_records(model, instrumented)
+
+
+def _lazy_getter(attribute, fget):
+    def lazy_fget(obj):
+        value = fget(obj)
+
+        if value is _Pending:
+            return _resolve(obj, attribute)
+
+        return value
+
+    return lazy_fget
+
+
+def _lazy_setter(attribute, f):
+    """Wrap the setter or deleter *f* to forget the raw value of *attribute*, which must not be parsed anymore."""
+    name = attribute.name
+
+    def lazy_f(obj, *args):
+        f(obj, *args)
+        obj.__raw__.pop(name, None)
+
+    return lazy_f
+
+
+def _validate(cls):
+    """Parse all attributes that have not been read yet.
+
+    Only lazy models defer parsing, for others this does nothing. Failures are
+    collected up to the error budget of the model and raised as one ModelError.
+    """
+    exceptions = []
+    max_errors = cls.__options__.max_errors
+
+    for attribute in cls.__schema__:
+        if getattr(cls, attribute.value_name) is _Pending:
+            try:
+                _resolve(cls, attribute)
+            except ModelError as e:
+                exceptions.extend(e.args[1])
+
+                if max_errors is not None and len(exceptions) >= max_errors:
+                    break
+
+    if exceptions:
+        raise ModelError(cls.__class__.__name__, exceptions)
+
+
+def _tracking(attribute, f):
+    """Wrap the setter or deleter *f* to record that *attribute* changed."""
+    name = attribute.name
+
+    def tracked(obj, *args):
+        f(obj, *args)
+        obj.__changed__.add(name)
+
+    return tracked
+
+
+def _changed_fields(cls):
+    """Return the names of the attributes set or deleted since construction or the last mark_clean."""
+    return frozenset(cls.__changed__)
+
+
+def _mark_clean(cls):
+    """Forget all changes, changed_fields is empty afterwards."""
+    cls.__changed__.clear()
+
+
+def _escape(key):
+    return key.replace('~', '~0').replace('/', '~1')
+
+
+def _to_patch(cls, by_alias=True):
+    """Return the changes since construction or the last mark_clean as JSON patch operations.
+
+    Changed attributes are added, which replaces their old value, and
+    attributes that are unset now are removed. Nested models and values
+    changed in place are not tracked.
+    """
+    patch = []
+
+    for name in sorted(cls.__changed__):
+        attribute = cls.__schema__.names[name]
+        key = (attribute.alias or name) if by_alias else name
+        value = getattr(cls, name)
+
+        if value is Unset:
+            patch.append({'op': 'remove', 'path': '/' + _escape(key)})
+        else:
+            patch.append({'op': 'add', 'path': '/' + _escape(key), 'value': _serialize(value, by_alias)})
+
+    return patch
+
+
+def _install_properties(model, frozen=False, lazy=False, tracked=False):
+    """Replace the attribute properties of *model* once, when it is decorated.
+
+    The properties are built from the attributes for the options of *model*
+    alone, so a subclass does not inherit the behaviour of its parent's.
+    Slotted models read straight from their slot descriptors, frozen models
+    get properties that refuse to be set or deleted, lazy models parse
+    values when they are read first and tracked models record changes.
+    """
+    for attribute in model.__schema__:
+        prop = getattr(model, attribute.name, None)
+
+        if not isinstance(prop, property):
+            continue
+
+        member = next(
+            (k.__dict__[attribute.value_name] for k in model.__mro__ if attribute.value_name in k.__dict__), None
+        )
+
+        fget = member.__get__ if hasattr(member, '__set__') else attribute.fget
+        fset, fdel = (attribute.fset, attribute.fdel) if attribute.mutable else (None, None)
+
+        if frozen:
+            fset = fdel = _read_only
+        else:
+            if lazy:
+                fset = fset and _lazy_setter(attribute, fset)
+                fdel = fdel and _lazy_setter(attribute, fdel)
+
+            if tracked:
+                fset = fset and _tracking(attribute, fset)
+                fdel = fdel and _tracking(attribute, fdel)
+
+        setattr(model, attribute.name, property(
+            fget=_lazy_getter(attribute, fget) if lazy else fget,
+            fset=fset,
+            fdel=fdel,
+            doc=attribute.help
+        ))
+
+
+def _make_hash(model, lazy=False, hide_unset=False):
+    """Generate a field-wise __hash__ for a frozen *model*, cached on first use.
+
+    Models hiding unset attributes compare None and Unset as equal, so both
+    are hashed as None.
+    """
+    if hide_unset:
+        values = ', '.join('_none(%s)' % _read(a, lazy) for a in model.__schema__)
+    else:
+        values = ', '.join(_read(a, lazy) for a in model.__schema__)
+
+    source = '\n'.join([
+        'def __hash__(self):',
+        '    try:',
+        '        return self.__hash_value__',
+        '    except AttributeError:',
+        '        value = self.__hash_value__ = hash((%s))' % (values + ',' if values else ''),
+        '        return value',
+    ])
+
+    namespace = {'_getattr': getattr, '_none': _unset_as_none}
+
+    exec(source, namespace)
+
+    model_hash = namespace['__hash__']
+    model_hash.__frozen__ = True
+
+    return model_hash
+
+
 class Model(object):
-    def __init__(self, mutable=True, hide_unset=False, drop_unknown=False, ignore_unknown=True):
+    def __init__(self, mutable=True, hide_unset=False, drop_unknown=False, ignore_unknown=True, slots=False,
+                 copy_policy='auto', lazy=False, track_changes=False, fail_fast=False, max_errors=None):
         self.mutable = mutable
         self.hide_unset = hide_unset
         self.drop_unknown = drop_unknown
         self.ignore_unknown = ignore_unknown
+        self.slots = slots
+        self.copy_policy = copy_policy
+        self.lazy = lazy
+        self.track_changes = track_changes
+        self.max_errors = 1 if fail_fast else max_errors
 
-    def __call__(self, model):
-        old_init = getattr(model, '__init__', None)
+        if copy_policy not in ('auto', 'deep', 'shallow', 'none'):
+            raise ValueError('unknown copy policy "%s"' % copy_policy)
 
-        def new_init(cls, *args, **kwargs):
-            exceptions = []
+        if self.max_errors is not None and self.max_errors < 1:
+            raise ValueError('max_errors must be at least 1')
 
-            for attribute in cls.__attributes__:
-                if hasattr(cls, attribute.name):
-                    if getattr(cls, attribute.name) is not Unset:
-                        continue
+    def __call__(self, model):
+        model.__schema__ = Schema.collect(model)
+        model.__attributes__ = model.__schema__.attributes
+        model.__copiers__ = dict((a.name, _copier(a, self.copy_policy)) for a in model.__schema__)
 
-                value = kwargs.pop(attribute.name,
-                        kwargs.pop(attribute.alias, Unset))  # noqa: E128
+        if self.slots:
+            extra = ('__hash_value__',) if not self.mutable else ()
+            extra += ('__raw__',) if self.lazy else ()
+            extra += ('__changed__',) if self.track_changes else ()
 
-                try:
-                    attribute.fset(cls, value)
-                except (AttributeError, ValueError) as e:
-                    exception = AttributeError(attribute, value, e)
-                    exception.__cause__ = None
-                    exceptions.append(exception)
+            model = _add_slots(model, extra=extra)
 
-                if not self.mutable:
-                    setattr(model, attribute.name,
-                            property(fget=getattr(model, attribute.name).fget)
-                            )
+        _install_properties(model, frozen=not self.mutable, lazy=self.lazy, tracked=self.track_changes)
 
-            if kwargs:
-                if self.drop_unknown:
-                    kwargs = {}
-                elif not self.ignore_unknown:
-                    exceptions.extend(
-                        (AttributeError(None, v, 'Unknown attribute "%s"' % k) for k, v in kwargs.items())
-                    )
+        if not self.mutable:
+            model.__hash__ = _make_hash(model, self.lazy, self.hide_unset)
+        elif getattr(model.__hash__, '__frozen__', False):
+            # a mutable model must not inherit the value based hash of a frozen parent
+            model.__hash__ = object.__hash__
 
-            if exceptions:
-                raise ModelError(cls.__class__.__name__, exceptions)
+        model.__options__ = self
+        model.__init__ = self._make_init(model, _stats.enabled)
 
-            if old_init:
-                old_init(cls, *args, **kwargs)
+        def getitem(cls, key):
+            a = cls.__schema__.index.get(key)
 
-        if old_init:
-            new_init.__doc__ = old_init.__doc__
+            if a is None:
+                raise KeyError(key)
 
-        def getitem(cls, key):
-            for a in cls.__attributes__:
-                if a.name == key or a.alias == key:
-                    try:
-                        return dict(getattr(cls, a.name))
-                    except (ValueError, TypeError):
-                        return getattr(cls, a.name)
+            value = getattr(cls, a.name)
 
-            raise KeyError(key)
+            # models have no __iter__, so dict() must not be tried on lists of them
+            if _is_model(value.__class__) or isinstance(value, dict):
+                return dict(value)
+
+            return value
 
-        model.__init__ = new_init
         model.__getitem__ = getitem
 
         model.__str__ = lambda cls: str(dict(cls))
         model.__repr__ = lambda cls: str(dict(cls))
-        model.__ne__ = lambda cls, o: not cls.__eq__(o)
-        model.__eq__ = lambda cls, o: (issubclass(o.__class__, cls.__class__) and dict(cls) == dict(o))
-        model.__contains__ = lambda cls, key: getattr(cls, key) not in [None, Unset]
-        model.keys = lambda cls: sorted(
-            [a.alias or a.name for a in cls.__attributes__ if (
-                getattr(cls, a.name) not in [None, Unset] or not self.hide_unset)]
-        )
+        model.__eq__, model.__ne__ = self._make_eq(model)
+        model.__contains__ = _contains
+
+        if self.hide_unset:
+            model.keys = lambda cls: [
+                key for key, a in cls.__schema__.items if not _is_unset(getattr(cls, a.name))
+            ]
+        else:
+            model.keys = lambda cls: list(cls.__schema__.keys)
+
+        if 'to_dict' not in model.__dict__:
+            model.to_dict = self._make_to_dict(model)
+
+        if 'from_records' not in model.__dict__:
+            model.from_records = self._make_from_records(model, _stats.enabled)
+
+        if 'to_json' not in model.__dict__:
+            model.to_json = _to_json
+
+        if 'validate' not in model.__dict__:
+            model.validate = _validate
+
+        if 'check' not in model.__dict__:
+            model.check = self._make_check(model)
+
+        if self.track_changes:
+            for name, method in (('changed_fields', _changed_fields), ('mark_clean', _mark_clean),
+                                 ('to_patch', _to_patch)):
+                if name not in model.__dict__:
+                    setattr(model, name, method)
+
+        if _aio is not None:
+            if 'acreate' not in model.__dict__:
+                model.acreate = classmethod(_aio.acreate)
+
+            if 'acreate_many' not in model.__dict__:
+                model.acreate_many = classmethod(_aio.acreate_many)
+
+        if not any(name in model.__dict__ for name in ('__reduce__', '__reduce_ex__', '__getstate__', '__setstate__')):
+            model.__getstate__, model.__setstate__ = self._make_state(model)
+
+        _models.add(model)
 
         return model
 
+    def _make_to_dict(self, model):
+        """Generate a serializer specialised for the attributes of *model*.
+
+        Nested models are serialized with their own serializer, scalar values are
+        copied as they are and only attributes of unknown type, or with a
+        transformation, are inspected when serializing.
+        """
+        namespace = {'Unset': Unset, '_serialize': _serialize, '_getattr': getattr}
+
+        lines = [
+            'def to_dict(self, by_alias=True, hide_unset=None, changed_only=False):',
+            '    hide = %r if hide_unset is None else hide_unset' % bool(self.hide_unset),
+            '    result = {}',
+        ]
+
+        if self.track_changes:
+            lines.append('    changed = self.__changed__ if changed_only else None')
+        else:
+            lines.append('    if changed_only:')
+            lines.append('        raise ValueError("%s does not track changes")' % model.__name__)
+
+        for key, attribute in model.__schema__.items:
+            # a transformation may store something else than the declared type
+            kind = _kind(attribute) if attribute.transformation is _identity else 'any'
+
+            if kind == 'scalar':
+                expression = 'value'
+            elif kind == 'model':
+                expression = 'value.to_dict(by_alias, hide_unset)'
+            elif kind == 'models':
+                expression = '[v.to_dict(by_alias, hide_unset) for v in value]'
+            else:
+                expression = '_serialize(value, by_alias, hide_unset)'
+
+            if key == attribute.name:
+                target = 'result[%r]' % key
+            else:
+                target = 'result[%r if by_alias else %r]' % (key, attribute.name)
+
+            indent = '    '
+
+            if self.track_changes:
+                lines.append('    if changed is None or %r in changed:' % attribute.name)
+                indent += '    '
+
+            lines.append(indent + 'value = %s' % _read(attribute, self.lazy))
+            lines.append(indent + 'if value is None or value is Unset:')
+            lines.append(indent + '    if not hide:')
+            lines.append(indent + '        %s = value' % target)
+            lines.append(indent + 'else:')
+            lines.append(indent + '    %s = %s' % (target, expression))
+
+        lines.append('    return result')
+
+        exec('\n'.join(lines), namespace)
+
+        to_dict = namespace['to_dict']
+        to_dict.__doc__ = (
+            'Serialize the model to a dictionary, using aliases as keys unless *by_alias* is False.\n\n'
+            'Models tracking changes only serialize the changed attributes if *changed_only* is set.'
+        )
+
+        return to_dict
+
+    def _make_eq(self, model):
+        """Generate __eq__ and __ne__ for *model*, comparing the stored values attribute by attribute.
+
+        The comparison stops at the first difference and identical values,
+        like those of interned attributes, are not compared at all. Nested
+        models are compared with their own generated __eq__. Instances of subclasses
+        with other attributes are compared as dictionaries. Models hiding
+        unset attributes treat None and Unset as equal.
+        """
+        namespace = {'Unset': Unset, '_getattr': getattr, '_issubclass': issubclass, '_schema': model.__schema__}
+
+        lines = [
+            'def __eq__(self, other):',
+            '    if other is self:',
+            '        return True',
+            '    if other.__class__ is not self.__class__:',
+            '        if not _issubclass(other.__class__, self.__class__):',
+            '            return False',
+            '        if other.__schema__ is not _schema:',
+            '            return dict(self) == dict(other)',
+        ]
+
+        for attribute in model.__schema__:
+            lines.append('    a = %s' % _read(attribute, self.lazy))
+            lines.append('    b = %s' % _read(attribute, self.lazy, 'other'))
+
+            if self.hide_unset:
+                lines.append('    if a is not b and a != b and not (')
+                lines.append('            (a is None or a is Unset) and (b is None or b is Unset)):')
+            else:
+                lines.append('    if a is not b and a != b:')
+
+            lines.append('        return False')
+
+        lines.extend([
+            '    return True',
+            '',
+            'def __ne__(self, other):',
+            '    return not self.__eq__(other)',
+        ])
+
+        exec('\n'.join(lines), namespace)
+
+        return namespace['__eq__'], namespace['__ne__']
+
+    def _make_state(self, model):
+        """Generate a compact __getstate__ and __setstate__ for *model*, used by pickle and copy.
+
+        The state is a tuple of the stored values in schema order, which are
+        assigned as they are when unpickling, without parsing them again.
+        Only values of interned attributes go through their intern table.
+        Values a lazy model has not parsed yet are kept in their raw form, just
+        like the changes of a tracked model and anything else a custom
+        __init__ stored in the instance __dict__. In these cases the state is
+        a dictionary.
+        """
+        value_names = [a.value_name for a in model.__schema__]
+
+        namespace = {
+            '_Pending': _Pending,
+            '_getattr': getattr,
+            '_setattr': setattr,
+            '_known': frozenset(value_names).union(['__hash_value__', '__raw__', '__changed__']),
+        }
+
+        lines = [
+            'def __getstate__(self):',
+            '    values = (%s)' % ''.join(_read(a) + ', ' for a in model.__schema__),
+            '    state = _getattr(self, "__dict__", None)',
+            '    if state and len(state) != %d:' % (len(value_names) + self.lazy + self.track_changes),
+            '        state = dict((k, v) for k, v in state.items() if k not in _known)',
+            '    else:',
+            '        state = None',
+        ]
+
+        if self.lazy:
+            lines.append('    raw = self.__raw__ or None')
+            lines.append('    if raw is not None:')
+            lines.append('        values = tuple(None if v is _Pending else v for v in values)')
+        else:
+            lines.append('    raw = None')
+
+        if self.track_changes:
+            lines.append('    changed = self.__changed__ or None')
+            lines.append('    if changed is not None:')
+            lines.append('        return {"values": values, "raw": raw, "state": state, "changed": changed}')
+
+        lines.extend([
+            '    if state or raw is not None:',
+            '        return {"values": values, "raw": raw, "state": state}',
+            '    return values',
+            '',
+            'def __setstate__(self, values):',
+            '    changed = None',
+            '    if values.__class__ is dict:',
+            '        raw, state, changed = values["raw"], values["state"], values.get("changed")',
+            '        values = values["values"]',
+            '        if state:',
+            '            self.__dict__.update(state)',
+            '    else:',
+            '        raw = None',
+        ])
+
+        if self.track_changes:
+            lines.append('    self.__changed__ = set(changed or ())')
+
+        if value_names and all(_is_identifier(name) for name in value_names):
+            lines.append('    %s, = values' % ', '.join('self.%s' % name for name in value_names))
+        else:
+            lines.append('    for name, value in zip(%r, values):' % (tuple(value_names),))
+            lines.append('        _setattr(self, name, value)')
+
+        for index, attribute in enumerate(model.__schema__):
+            if attribute.intern is not None:
+                namespace['_i%d' % index] = attribute.intern
+
+                if _is_identifier(attribute.value_name):
+                    lines.append('    self.%s = _i%d(self.%s)' % (attribute.value_name, index, attribute.value_name))
+                else:
+                    lines.append('    _setattr(self, %r, _i%d(%s))' % (attribute.value_name, index, _read(attribute)))
+
+        if self.lazy:
+            lines.append('    self.__raw__ = raw or {}')
+            lines.append('    if raw:')
+
+            for attribute in model.__schema__:
+                lines.append('        if %r in raw:' % attribute.name)
+                lines.append('            _setattr(self, %r, _Pending)' % attribute.value_name)
+
+        exec('\n'.join(lines), namespace)
+
+        return namespace['__getstate__'], namespace['__setstate__']
+
+    def _namespace(self, model, instrumented=False):
+        """The names available to the code generated for *model*."""
+        namespace = {
+            'Unset': Unset,
+            'ModelError': ModelError,
+            'BatchModelError': BatchModelError,
+            '_error': _error,
+            '_setattr': setattr,
+            '_Pending': _Pending,
+            '_islice': itertools.islice,
+            '_old_init': _user_init(model),
+        }
+
+        for index, attribute in enumerate(model.__schema__):
+            namespace['_a%d' % index] = attribute
+            namespace['_p%d' % index] = attribute.parse
+            namespace['_t%d' % index] = attribute.transformation
+            namespace['_f%d' % index] = attribute.fdefault
+            namespace['_d%d' % index] = attribute.default
+            namespace['_c%d' % index] = model.__copiers__[attribute.name]
+            namespace['_i%d' % index] = attribute.intern
+
+        if instrumented:
+            stats = _stats.model(model)
+
+            namespace['_clock'] = _stats.clock
+            namespace['_stats'] = stats
+            namespace['_convert'] = _timed_convert
+
+            for index, attribute in enumerate(model.__schema__):
+                namespace['_s%d' % index] = stats.attribute(attribute.name)
+
+        return namespace
+
+    def _populate_lines(self, model, indent, stop, instrumented=False):
+        """Generate the statements that fill *self* from the dictionary *kwargs*.
+
+        Name and alias lookup, defaults, parsing and the handling of unknown
+        keys are decided here once and written out as straight-line code.
+        Failures are collected in the list *exceptions*, unknown keys are left
+        in *kwargs* unless the model drops them. Once the error budget of the
+        model is used up, the statements *stop* are run. Instrumented code
+        converts values with _timed_convert instead.
+        """
+        lines = []
+
+        def add(line):
+            lines.append(' ' * indent + line)
+
+        if self.lazy:
+            add('raw = self.__raw__ = {}')
+
+        if self.track_changes:
+            add('self.__changed__ = set()')
+
+        for index, attribute in enumerate(model.__schema__):
+            if attribute.alias is not None:
+                add('value = kwargs.pop(%r, Unset)' % (attribute.alias,))
+                add('value = kwargs.pop(%r, value)' % (attribute.name,))
+            else:
+                add('value = kwargs.pop(%r, Unset)' % (attribute.name,))
+
+            if self.lazy:
+                add('raw[%r] = value' % (attribute.name,))
+
+                if _is_identifier(attribute.value_name):
+                    add('self.%s = _Pending' % attribute.value_name)
+                else:
+                    add('_setattr(self, %r, _Pending)' % attribute.value_name)
+
+                continue
+
+            add('try:')
+
+            if type(attribute).fset is not Attribute.fset:
+                add('    _a%d.fset(self, value)' % index)
+            elif instrumented:
+                parsed = '_convert(_a%d, value, _c%d, _s%d)' % (index, index, index)
+
+                if _is_identifier(attribute.value_name):
+                    add('    self.%s = %s' % (attribute.value_name, parsed))
+                else:
+                    add('    _setattr(self, %r, %s)' % (attribute.value_name, parsed))
+            else:
+                if attribute.default is not None:
+                    add('    if value is Unset:')
+                    add('        value = _d%d' % index)
+                elif attribute.fdefault is not None:
+                    add('    if value is Unset:')
+                    add('        value = _f%d()' % index)
+
+                if type(attribute).parse is Attribute.parse:
+                    parsed = '_p%d(value, _c%d)' % (index, index)
+                else:
+                    parsed = '_p%d(value)' % index
+
+                if attribute.transformation is not _identity:
+                    parsed = '_t%d(%s)' % (index, parsed)
+
+                if attribute.intern is not None:
+                    parsed = '_i%d(%s)' % (index, parsed)
+
+                if _is_identifier(attribute.value_name):
+                    add('    self.%s = %s' % (attribute.value_name, parsed))
+                else:
+                    add('    _setattr(self, %r, %s)' % (attribute.value_name, parsed))
+
+            add('except (AttributeError, ValueError) as e:')
+            add('    exceptions.append(_error(_a%d, value, e))' % index)
+
+            if self.max_errors is not None:
+                add('    if len(exceptions) >= %d:' % self.max_errors)
+
+                for line in stop:
+                    add('        ' + line)
+
+        if self.drop_unknown:
+            add('kwargs = {}')
+        elif not self.ignore_unknown:
+            if self.max_errors is None:
+                unknown = 'kwargs.items()'
+            else:
+                unknown = '_islice(kwargs.items(), %d - len(exceptions))' % self.max_errors
+
+            add('if kwargs:')
+            add('    exceptions.extend(_error(None, v, \'Unknown attribute "%%s"\' %% k) for k, v in %s)' % unknown)
+
+        return lines
+
+    def _make_init(self, model, instrumented=False):
+        """Generate a constructor specialised for the attributes of *model*.
+
+        Instrumented constructors record their duration and failures in the
+        ModelStats of *model*.
+        """
+        namespace = self._namespace(model, instrumented)
+        old_init = namespace['_old_init']
+        indent = ' ' * (8 if instrumented else 4)
+
+        stop = ['raise ModelError(self.__class__.__name__, exceptions)']
+
+        lines = [indent + 'exceptions = []']
+        lines.extend(self._populate_lines(model, len(indent), stop, instrumented))
+        lines.append(indent + 'if exceptions:')
+        lines.append(indent + '    ' + stop[0])
+
+        if old_init is object.__init__:
+            # object.__init__ does nothing, but it still rejects leftover arguments
+            lines.append(indent + 'if args or kwargs:')
+            lines.append(indent + '    _old_init(self, *args, **kwargs)')
+        elif old_init is not None:
+            lines.append(indent + '_old_init(self, *args, **kwargs)')
+
+        if self.track_changes and old_init is not object.__init__:
+            # attributes set by a custom __init__ are part of the construction
+            lines.append(indent + 'self.__changed__.clear()')
+
+        if instrumented:
+            lines = ['    start = _clock()', '    try:'] + lines + [
+                '    except Exception:',
+                '        _stats.record(_clock() - start, True)',
+                '        raise',
+                '    _stats.record(_clock() - start)',
+            ]
+
+        lines[:0] = ['def __init__(self, *args, **kwargs):'] + _asynchronous_lines(model, 4)
+
+        exec('\n'.join(lines), namespace)
+
+        new_init = namespace['__init__']
+        new_init.__user_init__ = old_init
+
+        if hasattr(model, '__qualname__'):
+            new_init.__qualname__ = '%s.__init__' % model.__qualname__
+
+        if old_init:
+            new_init.__doc__ = old_init.__doc__
+
+        return new_init
+
+    def _make_from_records(self, model, instrumented=False):
+        """Generate a batch constructor specialised for the attributes of *model*.
+
+        The generated code is the same as in __init__, but it runs in a single
+        loop over all records with everything it needs bound to local names.
+        """
+        namespace = self._namespace(model, instrumented)
+        old_init = namespace['_old_init']
+        names = sorted(namespace)
+
+        lines = [
+            'def __create__(%s):' % ', '.join(names),
+            '    def from_records(cls, records):',
+        ]
+        lines.extend(_asynchronous_lines(model, 8))
+        lines.extend([
+            '        instances = []',
+            '        errors = []',
+            '        new = cls.__new__',
+            '        for index, record in enumerate(records):',
+        ])
+
+        if instrumented:
+            lines.append('            start = _clock()')
+
+        lines.extend([
+            '            kwargs = dict(record)',
+            '            self = new(cls)',
+            '            exceptions = []',
+        ])
+        stop = ['errors.append((index, ModelError(cls.__name__, exceptions)))']
+
+        if instrumented:
+            stop.append('_stats.record(_clock() - start, True)')
+
+        stop.append('continue')
+
+        lines.extend(self._populate_lines(model, 12, stop, instrumented))
+        lines.append('            if exceptions:')
+        lines.extend('                ' + line for line in stop)
+
+        if old_init is object.__init__:
+            lines.append('            if kwargs:')
+            lines.append('                _old_init(self, **kwargs)')
+        elif old_init is not None:
+            lines.append('            _old_init(self, **kwargs)')
+
+        if self.track_changes and old_init is not object.__init__:
+            lines.append('            self.__changed__.clear()')
+
+        if instrumented:
+            lines.append('            _stats.record(_clock() - start)')
+
+        lines.append('            instances.append(self)')
+        lines.append('        if errors:')
+        lines.append('            raise BatchModelError(cls.__name__, errors)')
+        lines.append('        return instances')
+        lines.append('    return from_records')
+
+        scope = {}
+        exec('\n'.join(lines), scope)
+
+        from_records = scope['__create__'](*(namespace[name] for name in names))
+        from_records.__doc__ = (
+            'Create a list of models from an iterable of dictionaries.\n\n'
+            'Raises a BatchModelError with the index of every failed record.'
+        )
+        from_records.__generated__ = True
+
+        return classmethod(from_records)
+
+    def _make_check(self, model):
+        """Generate a validator for dictionaries, which parses the values but does not build a model.
+
+        Defaults, types and the handling of unknown keys are the same as in
+        __init__. Values are not copied or stored, and neither transformations
+        nor a custom __init__ are run, so keys left for a custom __init__ are
+        not checked.
+        """
+        namespace = self._namespace(model)
+        namespace['_identity'] = _identity
+
+        known = set()
+
+        lines = [
+            'def check(cls, payload):',
+        ]
+        lines.extend(_asynchronous_lines(model, 4))
+        lines.extend([
+            '    errors = []',
+            '    get = payload.get',
+        ])
+
+        for index, attribute in enumerate(model.__schema__):
+            known.add(attribute.name)
+
+            if attribute.alias is not None:
+                known.add(attribute.alias)
+                lines.append('    value = get(%r, get(%r, Unset))' % (attribute.name, attribute.alias))
+            else:
+                lines.append('    value = get(%r, Unset)' % (attribute.name,))
+
+            lines.append('    try:')
+
+            if attribute.default is not None:
+                lines.append('        if value is Unset:')
+                lines.append('            value = _d%d' % index)
+            elif attribute.fdefault is not None:
+                lines.append('        if value is Unset:')
+                lines.append('            value = _f%d()' % index)
+
+            if type(attribute).parse is Attribute.parse:
+                lines.append('        _p%d(value, _identity)' % index)
+            else:
+                lines.append('        _p%d(value)' % index)
+
+            lines.append('    except (AttributeError, ValueError) as e:')
+            lines.append('        errors.append(_error(_a%d, value, e))' % index)
+
+            if self.max_errors is not None:
+                lines.append('        if len(errors) >= %d:' % self.max_errors)
+                lines.append('            return errors')
+
+        # without a custom __init__ to take them, object.__init__ rejects unknown keys as well
+        if not self.drop_unknown and (not self.ignore_unknown or namespace['_old_init'] is object.__init__):
+            namespace['_known'] = frozenset(known)
+
+            lines.append('    for key in payload:')
+            lines.append('        if key not in _known:')
+            lines.append('            errors.append(_error(None, payload[key], \'Unknown attribute "%s"\' % key))')
+
+            if self.max_errors is not None:
+                lines.append('            if len(errors) >= %d:' % self.max_errors)
+                lines.append('                return errors')
+
+        lines.append('    return errors')
+
+        exec('\n'.join(lines), namespace)
+
+        check = namespace['check']
+        check.__doc__ = (
+            'Validate the dictionary *payload* without creating a model.\n\n'
+            'Returns the errors the constructor would raise in a ModelError, an empty list if it is valid.'
+        )
+
+        return classmethod(check)
+
 
 class Attribute(object):
-    def __init__(self, name, type, optional=False, nullable=False, mutable=True, default=None, fdefault=None, alias=None, help=None, value_by_reference=False, transformation=None):
+    def __init__(self, name, type, optional=False, nullable=False, mutable=True, default=None, fdefault=None, alias=None, help=None, value_by_reference=False, transformation=None, cache=None, intern=None):
         self.name = name
         self.type = type
         self.default = default
@@ -109,21 +1203,27 @@ class Attribute(object):
         self.alias = alias
         self.help = help
         self.value_by_reference = value_by_reference
-        self.transformation = transformation or (lambda x: x)
+        self.transformation = transformation or _identity
+        self.value_name = '_%s' % name
+        self.cache = LRUCache(cache) if cache else None
+        self.intern = InternTable(None if intern is True else intern) if intern else None
+        self.asynchronous = _is_coroutine_function(type) or _is_coroutine_function(self.transformation)
+        # chosen once, scalars and list_types only take their value as a single argument
+        self.positional = (type in _SCALARS or isinstance(type, list_type)) and (
+            self.__class__.construct is Attribute.construct)
+
+        if cache and _is_coroutine_function(type):
+            raise ValueError('the results of coroutine types can not be cached')
 
     def __repr__(self):
         return str(vars(self))
 
     def __call__(self, model):
-        if not hasattr(model, '__attributes__'):
-            model.__attributes__ = set()
+        declared = [a for a in model.__dict__.get('__declared_attributes__', ()) if a.name != self.name]
 
-        try:
-            model.__attributes__.remove(next((a for a in model.__attributes__ if a.name == self.name)))
-        except StopIteration:
-            pass
-        finally:
-            model.__attributes__.add(self)
+        # decorators are applied bottom up, so prepending keeps declaration order
+        model.__declared_attributes__ = [self] + declared
+        model.__attributes__ = Schema.collect(model).attributes
 
         setattr(model, self.value_name, Unset)
 
@@ -142,13 +1242,38 @@ class Attribute(object):
         return getattr(cls, self.value_name)
 
     def fset(self, cls, value):
+        if self.asynchronous:
+            raise TypeError('%s has a coroutine type or transformation, set it with acreate' % self.name)
+
+        copiers = getattr(cls, '__copiers__', None)
+        copier = copiers.get(self.name) if copiers else None
+
+        if _stats.enabled:
+            value = _timed_convert(self, value, copier, _stats.model(cls.__class__).attribute(self.name))
+        else:
+            value = self.convert(value, copier)
+
+        setattr(cls, self.value_name, value)
+
+    def convert(self, value, copier=None):
+        """Apply the default, then parse and transform *value*."""
         if value is Unset:
             if self.default is not None:
                 value = self.default
             elif self.fdefault is not None:
                 value = self.fdefault()
 
-        setattr(cls, self.value_name, self.transformation(self.parse(value)))
+        if type(self).parse is Attribute.parse:
+            value = self.parse(value, copier)
+        else:
+            value = self.parse(value)
+
+        value = self.transformation(value)
+
+        if self.intern is not None:
+            value = self.intern(value)
+
+        return value
 
     def fdel(self, cls):
         setattr(cls, self.value_name, Unset)
@@ -161,11 +1286,7 @@ class Attribute(object):
         else:
             raise AttributeError(self, "Attribute has not default")
 
-    @property
-    def value_name(self):
-        return '_%s' % self.name
-
-    def parse(self, value):
+    def parse(self, value, copier=None):
         if value is Unset:
             if self.optional:
                 return value
@@ -177,15 +1298,47 @@ class Attribute(object):
             else:
                 value = self.get_default()
 
-        if not self.value_by_reference:
-            value = copy.deepcopy(value)
+        if copier is None:
+            if not self.value_by_reference:
+                value = copy.deepcopy(value)
+        elif copier is not _identity:
+            value = copier(value)
 
         if self.type is None or self.type is type(value):
             return value
 
+        if self.positional:
+            construct = self.type
+        else:
+            construct = self.construct
+
+        if self.cache is not None:
+            try:
+                # 1, 1.0 and True are equal, but may well convert differently
+                key = (type(value), value)
+                result = self.cache.get(key, Unset)
+            except TypeError:
+                return construct(value)
+
+            if result is Unset:
+                result = construct(value)
+                self.cache.set(key, result)
+
+            return result
+
+        return construct(value)
+
+    def construct(self, value):
         try:
             return self.type(**value)
         except TypeError:
             return self.type(value)
 
+
+try:
+    from simple_model.v2 import aio as _aio
+except SyntaxError:
+    # python < 3.8
+    _aio = None
+
 # vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: simple_model.v2.aio
+   :platform: Unix
+   :synopsis: Create v2 models with coroutine types and transformations.
+
+.. moduleauthor:: Aljosha Friemann a.friemann@automate.wtf
+
+Requires python 3.8 or newer, on older versions models do not get acreate
+and acreate_many.
+"""
+
+import asyncio
+import inspect
+import itertools
+
+from simple_model.v2 import Attribute, BatchModelError, ModelError, Unset, _error, _user_init
+
+
+async def acreate(model, /, *args, **kwargs):
+    """Create an instance of *model*, awaiting types and transformations that return awaitables.
+
+    Attributes with a synchronous type are parsed right away, the coroutines
+    of all others run concurrently. Failures are collected and raised as one
+    ModelError, just like the constructor does. Lazy models parse all
+    attributes here as well.
+
+    Installed on every model as the classmethod acreate.
+    """
+    options = model.__options__
+    max_errors = options.max_errors
+    obj = model.__new__(model)
+    exceptions = []
+    pending = []
+
+    for attribute in model.__schema__:
+        value = kwargs.pop(attribute.alias, Unset) if attribute.alias is not None else Unset
+        value = kwargs.pop(attribute.name, value)
+
+        try:
+            if type(attribute).fset is not Attribute.fset:
+                attribute.fset(obj, value)
+                continue
+
+            result = _parse(attribute, value, model.__copiers__[attribute.name])
+
+            if inspect.isawaitable(result):
+                pending.append((attribute, value, result, False))
+                continue
+
+            result = attribute.transformation(result)
+        except (AttributeError, ValueError) as e:
+            exceptions.append(_error(attribute, value, e))
+
+            if max_errors is not None and len(exceptions) >= max_errors:
+                for _, _, awaitable, _ in pending:
+                    _discard(awaitable)
+
+                raise ModelError(model.__name__, exceptions)
+
+            continue
+
+        if inspect.isawaitable(result):
+            pending.append((attribute, value, result, True))
+        else:
+            setattr(obj, attribute.value_name, _intern(attribute, result))
+
+    if pending:
+        results = await asyncio.gather(
+            *(_finish(attribute, awaitable, transformed) for attribute, _, awaitable, transformed in pending),
+            return_exceptions=True
+        )
+
+        for (attribute, value, _, _), result in zip(pending, results):
+            if isinstance(result, (AttributeError, ValueError)):
+                exceptions.append(_error(attribute, value, result))
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                setattr(obj, attribute.value_name, _intern(attribute, result))
+
+        if max_errors is not None and len(exceptions) >= max_errors:
+            raise ModelError(model.__name__, exceptions[:max_errors])
+
+    if options.lazy:
+        obj.__raw__ = {}
+
+    if options.track_changes:
+        obj.__changed__ = set()
+
+    if options.drop_unknown:
+        kwargs = {}
+    elif not options.ignore_unknown and kwargs:
+        unknown = kwargs.items()
+
+        if max_errors is not None:
+            unknown = itertools.islice(unknown, max_errors - len(exceptions))
+        exceptions.extend(_error(None, v, 'Unknown attribute "%s"' % k) for k, v in unknown)
+
+    if exceptions:
+        raise ModelError(model.__name__, exceptions)
+
+    old_init = _user_init(model)
+
+    if old_init is not object.__init__ or args or kwargs:
+        old_init(obj, *args, **kwargs)
+
+        if options.track_changes:
+            obj.__changed__.clear()
+
+    return obj
+
+
+async def acreate_many(model, records, concurrency=64):
+    """Create a list of instances of *model* from an iterable of dictionaries with acreate.
+
+    At most *concurrency* records are created at the same time and the records
+    are only read from *records* as they are needed. All failures are collected
+    and raised as one BatchModelError with the index of every failed record.
+
+    Installed on every model as the classmethod acreate_many.
+    """
+    records = enumerate(records)
+    instances = {}
+    errors = []
+
+    async def worker():
+        for index, record in records:
+            try:
+                instances[index] = await acreate(model, **record)
+            except ModelError as e:
+                errors.append((index, e))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    if errors:
+        raise BatchModelError(model.__name__, sorted(errors, key=lambda error: error[0]))
+
+    return [instances[index] for index in sorted(instances)]
+
+
+def _parse(attribute, value, copier):
+    """Apply the default and parse *value*, the result may be awaitable."""
+    if value is Unset:
+        if attribute.default is not None:
+            value = attribute.default
+        elif attribute.fdefault is not None:
+            value = attribute.fdefault()
+
+    if type(attribute).parse is Attribute.parse:
+        return attribute.parse(value, copier)
+
+    return attribute.parse(value)
+
+
+def _discard(awaitable):
+    """Close a coroutine that will not be awaited, other awaitables are cancelled if possible."""
+    if inspect.iscoroutine(awaitable):
+        awaitable.close()
+    elif hasattr(awaitable, 'cancel'):
+        awaitable.cancel()
+
+
+def _intern(attribute, value):
+    return value if attribute.intern is None else attribute.intern(value)
+
+
+async def _finish(attribute, awaitable, transformed):
+    """Await the parsed value and transform it, unless *awaitable* is the result of the transformation."""
+    if transformed:
+        return await awaitable
+
+    value = attribute.transformation(await awaitable)
+
+    if inspect.isawaitable(value):
+        value = await value
+
+    return value
+
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
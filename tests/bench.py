@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+from simple_model import bench
+
+
+def test_run():
+    result = bench.run(filter='narrow-shallow', repeat=1, number=1)
+
+    assert sorted(result['results']) == sorted(
+        '%s/narrow-shallow/%s' % (version, operation)
+        for version in ('v1', 'v2')
+        for operation in ('construct', 'dict', 'eq', 'error', 'list_type')
+    )
+
+    for name, before, after, ratio in bench.compare(result, result):
+        assert ratio == 1.0
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+
+import sys
+
+collect_ignore = ['v2/aio.py'] if sys.version_info < (3, 8) else []
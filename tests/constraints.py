@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import enum
+
+import pytest
+
+from simple_model.constraints import one_of, in_range, length, matches, string_format, fuse
+from simple_model.v2 import Model, Attribute, ModelError
+
+
+class Color(enum.Enum):
+    red = 'red'
+    blue = 'blue'
+
+
+def test_one_of():
+    assert one_of('a', 'b')('b') == 'b'
+    assert one_of(Color)('red') == 'red'
+    assert one_of([1], [2])([2]) == [2]
+
+    with pytest.raises(ValueError) as e:
+        one_of('bar', 'foobar')('foo')
+
+    assert str(e.value) == "must be one of ('bar', 'foobar') but was 'foo'"
+
+    with pytest.raises(ValueError):
+        one_of('a')(['a'])
+
+
+def test_in_range_and_length():
+    assert in_range(0, 10)(10) == 10
+    assert in_range(maximum=1.5)(-3) == -3
+    assert length(minimum=1)('a') == 'a'
+
+    for validator, value, message in (
+            (in_range(0, 10), 11, 'must be between 0 and 10 but was 11'),
+            (in_range(minimum=0), 'x', "must be at least 0 but was 'x'"),
+            (length(maximum=2), 'abc', 'length must be at most 2 but was 3'),
+            (length(1, 2), 5, 'length must be between 1 and 2 but 5 has no length')):
+        with pytest.raises(ValueError) as e:
+            validator(value)
+
+        assert str(e.value) == message
+
+    with pytest.raises(ValueError):
+        in_range()
+
+
+def test_matches_and_string_format():
+    assert matches(r'\d+')('123') == '123'
+    assert string_format('uuid')('12345678-1234-1234-1234-123456789abc')
+
+    with pytest.raises(ValueError) as e:
+        matches(r'\d+')('123a')
+
+    assert str(e.value) == "must match '\\d+' but was '123a'"
+
+    with pytest.raises(ValueError) as e:
+        string_format('ipv4')('256.0.0.1')
+
+    assert str(e.value) == "must be a valid ipv4 but was '256.0.0.1'"
+
+    with pytest.raises(ValueError):
+        string_format('unknown')
+
+
+def test_fuse_converts_and_checks_in_order():
+    port = fuse(int, in_range(1, 65535))
+
+    assert port('80') == 80
+    assert (str & length(maximum=3))(12) == '12'
+    assert fuse(port, one_of(80, 443))('443') == 443
+
+    with pytest.raises(ValueError):
+        port('0')
+
+
+def test_fused_validator_as_attribute_type():
+    @Model()
+    @Attribute('port', type=fuse(int, in_range(1, 65535)))
+    @Attribute('color', type=one_of(Color), optional=True)
+    class Data(object):
+        pass
+
+    assert Data(port='22').port == 22
+
+    with pytest.raises(ModelError) as e:
+        Data(port='70000', color='green')
+
+    assert 'must be between 1 and 65535 but was 70000' in str(e.value)
+    assert "must be one of ('red', 'blue') but was 'green'" in str(e.value)
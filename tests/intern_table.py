@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from simple_model.helpers import InternTable
+
+
+class InternTableTestCase(unittest.TestCase):
+    def test_returns_kept_instance(self):
+        table = InternTable()
+
+        first = ''.join(['a', 'b'])
+        second = ''.join(['a', 'b'])
+
+        self.assertIs(table(first), first)
+        self.assertIs(table(second), first)
+        self.assertIs(table((1, first)), table((1, second)))
+        self.assertEqual(len(table), 2)
+
+    def test_keeps_types_apart(self):
+        table = InternTable()
+
+        self.assertIs(table(1), 1)
+        self.assertIs(table(True), True)
+        self.assertIs(type(table(1.0)), float)
+        self.assertEqual(table((True, 1.0)), (True, 1.0))
+        self.assertIs(type(table((1, 1))[0]), int)
+
+    def test_bounded_and_unhashable(self):
+        table = InternTable(1)
+        value = [1]
+
+        self.assertIs(table(value), value)
+
+        table('a')
+        b = ''.join(['b', 'b'])
+
+        self.assertIs(table(b), b)
+        self.assertIsNot(table(''.join(['b', 'b'])), b)
+        self.assertEqual(len(table), 1)
+
+        table.clear()
+
+        self.assertEqual(len(table), 0)
+        self.assertRaises(ValueError, InternTable, 0)
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
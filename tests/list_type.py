@@ -8,10 +8,13 @@
 
 """
 
+import array
+import pickle
 import unittest
 
 from simple_model import Model, Attribute
-from simple_model.helpers import list_type
+from simple_model import v2
+from simple_model.helpers import list_type, LazyList
 
 class ListTypeTestCase(unittest.TestCase):
     def test_with_simple_types(self):
@@ -26,4 +29,104 @@ class ListTypeTestCase(unittest.TestCase):
         for element in result:
             self.assertIsInstance(element, Foo)
 
+    def test_converts_in_a_single_pass(self):
+        calls = []
+
+        def parse(**kwargs):
+            calls.append(kwargs)
+
+            if kwargs['a'] == 2:
+                raise TypeError('invalid')
+
+            return kwargs['a']
+
+        self.assertEqual(list_type(parse)([{'a': 1}, {'a': 3}]), [1, 3])
+        self.assertRaises(TypeError, list_type(parse), [{'a': 1}, {'a': 2}, {'a': 3}])
+        self.assertEqual(len(calls), 4)
+
+    def test_passes_mappings_as_they_are_if_keywords_are_rejected(self):
+        self.assertEqual(list_type(sorted)([{'b': 1, 'a': 2}]), [['a', 'b']])
+        self.assertEqual(list_type(str)([{'a': 1}]), ["{'a': 1}"])
+
+    def test_with_typecode(self):
+        result = list_type(float, typecode='d')([1, 2.5, '3'])
+
+        self.assertEqual(result, array.array('d', [1.0, 2.5, 3.0]))
+        self.assertEqual(list_type(int, typecode='q')([1, 2.9, '3']), array.array('q', [1, 2, 3]))
+
+    def test_typecode_overflow_is_a_value_error(self):
+        self.assertRaises(ValueError, list_type(int, typecode='b'), [1000])
+        self.assertRaises(ValueError, list_type(lambda v: int(v), typecode='b'), ['1000'])
+
+        @v2.Model()
+        @v2.Attribute('values', type=list_type(int, typecode='b'))
+        class Data(object):
+            pass
+
+        self.assertRaises(v2.ModelError, Data, values=[1000])
+
+    def test_lazy(self):
+        calls = []
+
+        def parse(value):
+            calls.append(value)
+            return int(value)
+
+        result = list_type(parse, lazy=True)(['1', '2', '3', 'x'])
+
+        self.assertIsInstance(result, LazyList)
+        self.assertEqual(len(result), 4)
+        self.assertEqual(calls, [])
+
+        self.assertEqual(result[1], 2)
+        self.assertEqual(result[1], 2)
+        self.assertEqual(result[:2], [1, 2])
+        self.assertEqual(calls, ['2', '1'])
+
+        self.assertRaises(ValueError, lambda: result[3])
+        self.assertEqual(pickle.loads(pickle.dumps(result[:3])), [1, 2, 3])
+
+    def test_lazy_elements_are_copied(self):
+        @v2.Model()
+        @v2.Attribute('c', type=int)
+        class Kid(object):
+            pass
+
+        @v2.Model()
+        @v2.Attribute('kids', type=list_type(Kid, lazy=True))
+        class Parent(object):
+            pass
+
+        source = [{'c': 1}]
+        parent = Parent(kids=source)
+        source[0]['c'] = 99
+
+        self.assertEqual(parent.kids[0].c, 1)
+
+    def test_lazy_and_typecode_are_exclusive(self):
+        self.assertRaises(ValueError, list_type, float, typecode='d', lazy=True)
+
+    def test_serialization_of_arrays_and_lazy_lists(self):
+        @v2.Model()
+        @v2.Attribute('values', type=list_type(float, typecode='d'))
+        @v2.Attribute('points', type=list_type(int, lazy=True))
+        class Data(object):
+            pass
+
+        data = Data(values=[1, 2], points=['3'])
+
+        self.assertEqual(data.to_dict(), {'values': [1.0, 2.0], 'points': [3]})
+        self.assertEqual(data.to_json(sort_keys=True), '{"points": [3], "values": [1.0, 2.0]}')
+        self.assertEqual(data, Data(values=[1, 2], points=['3']))
+
+    def test_v1_serialization_of_arrays_and_lazy_lists(self):
+        class Data(Model):
+            values = Attribute(list_type(float, typecode='d'))
+            points = Attribute(list_type(int, lazy=True))
+
+        data = dict(Data(values=[1, 2], points=['3']))
+
+        self.assertEqual(data, {'values': [1.0, 2.0], 'points': [3]})
+        self.assertIs(type(data['values']), list)
+
 # vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from simple_model.helpers import LRUCache
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_counts_hits_and_misses(self):
+        cache = LRUCache(2)
+
+        cache.get('a')
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+        cache.clear()
+
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
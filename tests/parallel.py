@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from simple_model.v2 import Model, Attribute, ModelError, BatchModelError
+from simple_model.parallel import validate_many
+
+
+@Model()
+@Attribute('foo', type=str)
+@Attribute('bar', type=int, default=0)
+class Record(object):
+    pass
+
+
+@Model()
+@Attribute('foo', type=str, cache=10)
+@Attribute('bar', type=lambda value: int(value), transformation=lambda value: value + 1)
+class Unpicklable(object):
+    pass
+
+
+RECORDS = [{'foo': str(i), 'bar': str(i)} for i in range(50)]
+
+
+def test_validate_many_keeps_input_order():
+    assert validate_many(Record, RECORDS, workers=2, chunk_size=7) == Record.from_records(RECORDS)
+
+
+def test_validate_many_accepts_iterators_and_executors():
+    with ProcessPoolExecutor(2) as executor:
+        assert validate_many(Record, iter(RECORDS), executor=executor) == Record.from_records(RECORDS)
+
+
+def test_validate_many_as_dict():
+    assert validate_many(Record, RECORDS[:3], workers=2, as_dict=True) == [
+        {'foo': '0', 'bar': 0}, {'foo': '1', 'bar': 1}, {'foo': '2', 'bar': 2}
+    ]
+
+
+def test_validate_many_merges_errors_with_record_indices():
+    records = list(RECORDS)
+    records[3] = {'foo': 'abc', 'bar': 'x'}
+    records[42] = {'bar': 1, 'baz': 2}
+
+    with pytest.raises(BatchModelError) as e:
+        validate_many(Record, records, workers=2, chunk_size=10)
+
+    assert [index for index, _ in e.value.args[1]] == [3, 42]
+
+    error = e.value.args[1][0][1]
+
+    assert isinstance(error, ModelError)
+    assert error.args[1][0].args[0] is Record.__schema__['bar']
+    assert '- record: 42' in str(e.value)
+
+
+def test_validate_many_reports_missing_attributes_with_unpicklable_attributes():
+    with pytest.raises(BatchModelError) as e:
+        validate_many(Unpicklable, [{'foo': 'a', 'bar': 1}, {}], workers=2, chunk_size=1)
+
+    [(index, error)] = e.value.args[1]
+
+    assert index == 1
+    assert [arg.args[0] for arg in error.args[1]] == [Unpicklable.__schema__['foo'], Unpicklable.__schema__['bar']]
+    assert error.args[1][0].args[2].args[0] is Unpicklable.__schema__['foo']
+    assert 'Attribute is not optional' in str(error.args[1][0].args[2])
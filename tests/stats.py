@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+from simple_model import stats
+from simple_model.v2 import Model, Attribute, ModelError, BatchModelError
+
+
+@Model()
+@Attribute('foo', type=int, default=3)
+@Attribute('bar', type=list, transformation=sorted)
+class Record(object):
+    pass
+
+
+def record_stats():
+    return stats.snapshot().get(Record)
+
+
+def test_nothing_is_recorded_while_disabled():
+    stats.reset()
+
+    Record(bar=[])
+
+    assert record_stats() is None
+
+
+def test_constructions_and_attributes_are_counted():
+    stats.reset()
+    stats.enable()
+
+    try:
+        Record(bar=[2, 1])
+        Record(foo='1', bar=[])
+
+        try:
+            Record(foo='x', bar=[])
+        except ModelError:
+            pass
+
+        try:
+            Record.from_records([{'bar': [1]}, {'foo': 'x', 'bar': []}])
+        except BatchModelError:
+            pass
+
+        record = Record(bar=[])
+        record.foo = 5
+    finally:
+        stats.disable()
+
+    counters = record_stats()
+
+    assert counters['count'] == 6
+    assert counters['failures'] == 2
+    assert sum(counters['histogram'].values()) == 6
+
+    assert counters['attributes']['foo']['count'] == 5
+    assert counters['attributes']['foo']['failures'] == 2
+    assert counters['attributes']['foo']['defaults'] == 3
+    assert counters['attributes']['bar']['count'] == 6
+    assert counters['attributes']['bar']['transform_time'] > 0
+
+    Record(bar=[])
+
+    assert record_stats()['count'] == 6
+
+
+def test_reset_keeps_instrumented_constructors_working():
+    stats.enable()
+
+    try:
+        Record(bar=[])
+        stats.reset()
+
+        assert record_stats() is None
+
+        Record(bar=[])
+
+        assert record_stats()['count'] == 1
+    finally:
+        stats.disable()
+
+
+def test_lazy_models_record_parsing_on_access():
+    @Model(lazy=True)
+    @Attribute('foo', type=int)
+    class Lazy(object):
+        pass
+
+    stats.enable()
+
+    try:
+        lazy = Lazy(foo='1')
+
+        assert stats.snapshot()[Lazy]['attributes']['foo']['count'] == 0
+
+        assert lazy.foo == 1
+        assert stats.snapshot()[Lazy]['attributes']['foo']['count'] == 1
+    finally:
+        stats.disable()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+
+from simple_model.v2 import Model, Attribute, ModelError
+from simple_model.stream import load
+
+
+@Model()
+@Attribute('foo', type=str)
+@Attribute('bar', type=int, default=0)
+class Record(object):
+    pass
+
+
+RECORDS = [{'foo': 'abc'}, {'foo': 'def', 'bar': 1}, {'foo': 'ghi', 'bar': '2'}]
+
+
+def test_load_ndjson():
+    source = io.StringIO(u'\n'.join(json.dumps(r) for r in RECORDS))
+
+    assert list(load(Record, source, chunk_size=5)) == [Record(**r) for r in RECORDS]
+
+
+def test_load_json_array():
+    source = io.BytesIO(json.dumps(RECORDS, indent=2).encode('utf-8'))
+
+    assert list(load(Record, source, chunk_size=5)) == [Record(**r) for r in RECORDS]
+
+
+def test_load_is_lazy():
+    source = io.StringIO(u'{"foo": "abc"}\n{"foo": "def"}\n{"bar": "x"}')
+
+    records = load(Record, source)
+
+    assert next(records).foo == 'abc'
+    assert next(records).foo == 'def'
+
+    try:
+        next(records)
+        assert False, 'invalid record did not raise'
+    except ModelError:
+        pass
+
+
+def test_load_collects_errors():
+    source = io.StringIO(u'[\n{"foo": "abc"},\n{"bar": "x"},\n{"foo": "def"},\n1\n]')
+    errors = []
+
+    result = list(load(Record, source, errors=errors, chunk_size=3))
+
+    assert [r.foo for r in result] == ['abc', 'def']
+    assert [line for line, _ in errors] == [3, 5]
+    assert isinstance(errors[0][1], ModelError)
+
+
+def test_load_collects_unknown_keys_rejected_by_init():
+    source = io.StringIO(u'{"foo": "abc"}\n{"foo": "def", "baz": 2}\n{"foo": "ghi"}')
+    errors = []
+
+    result = list(load(Record, source, errors=errors))
+
+    assert [r.foo for r in result] == ['abc', 'ghi']
+    assert [line for line, _ in errors] == [2]
+    assert isinstance(errors[0][1], TypeError)
+
+
+def test_load_from_path(tmpdir):
+    path = tmpdir.join('records.ndjson')
+    path.write('\n'.join(json.dumps(r) for r in RECORDS))
+
+    assert list(load(Record, str(path))) == [Record(**r) for r in RECORDS]
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
@@ -15,6 +15,7 @@ logging.basicConfig(level=logging.DEBUG)
 import unittest
 
 from simple_model import Model, Attribute
+from simple_model.v1 import FailedAttribute, UnknownKey
 from simple_model.helpers import list_type
 
 class ModelTestCase(unittest.TestCase):
@@ -85,6 +86,43 @@ class ModelTestCase(unittest.TestCase):
 
         self.assertEqual(dict(result), {})
 
+    def test_model_should_find_attributes_once_per_class(self):
+        class Foo(Model):
+            b = Attribute(str)
+            a = Attribute(str, optional=True)
+
+        class Bar(Foo):
+            c = Attribute(int, fallback=1)
+
+        self.assertEqual([key for key, _ in Foo.__fields__], ['a', 'b'])
+        self.assertEqual([key for key, _ in Bar.__fields__], ['a', 'b', 'c'])
+
+        Foo.d = Attribute(str, optional=True)
+
+        self.assertIn('d', Foo(b='x'))
+        self.assertEqual(dict(Bar(b='x')), {'a': None, 'b': 'x', 'c': 1, 'd': None})
+
+    def test_model_should_use_descriptors_for_attributes(self):
+        from simple_model.v1.model import Field
+
+        self.assertIsInstance(self.uut.__dict__['name'], Field)
+        self.assertIsInstance(self.uut.name, Attribute)
+
+        uut = self.uut(name = 'test', number = '3')
+
+        self.assertEqual(uut.__dict__['number'], 3)
+
+        uut.number = '4'
+
+        self.assertEqual(uut.number, 4)
+        self.assertIsNone(self.uut.number.value)
+
+    def test_model_should_not_share_values_between_instances(self):
+        first = self.uut(name = 'first', number = 1)
+        second = self.uut(name = 'second', number = 2)
+
+        self.assertEqual((first.name, second.name), ('first', 'second'))
+
     def test_model_should_raise_if_unknown_disallowed(self):
         class Foo(Model):
             __ignore_unknown__ = False
@@ -157,6 +195,48 @@ class ModelCastTestCase(unittest.TestCase):
         except ValueError as e:
             self.assertEqual(len(e.args), 3)
 
+    def test_model_should_format_errors_when_read(self):
+        class Foo(Model):
+            __ignore_unknown__ = False
+
+            a = Attribute(int)
+
+        try:
+            Foo(a='abc', b=1)
+            assert False, 'initialization did not raise an Exception'
+        except ValueError as e:
+            failed, unknown = e.args
+
+            self.assertEqual(failed['key'], 'a')
+            self.assertEqual(failed['value'], 'abc')
+            self.assertTrue(failed['exception'].startswith('ValueError: invalid literal'))
+            self.assertEqual(dict(failed), eval(repr(failed)))
+
+            self.assertEqual(unknown, 'Unknown key "b" with value "1"')
+            self.assertIsInstance(failed, FailedAttribute)
+            self.assertIsInstance(unknown, UnknownKey)
+            self.assertIsInstance(failed.exception, ValueError)
+
+    def test_model_should_not_format_debug_messages_when_disabled(self):
+        formatted = []
+
+        class CountingAttribute(Attribute):
+            def __str__(self):
+                formatted.append(self)
+                return super(CountingAttribute, self).__str__()
+
+        class Foo(Model):
+            a = CountingAttribute(int)
+
+        Foo.__logger__.setLevel(logging.INFO)
+
+        try:
+            Foo(a=1)
+        finally:
+            Foo.__logger__.setLevel(logging.NOTSET)
+
+        self.assertEqual(formatted, [])
+
     def test_model_should_find_attribute_value_by_alias(self):
         class Foo(Model):
             a = Attribute(str, alias='b')
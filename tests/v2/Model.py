@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import copy
+import pickle
 import sys
 
-from simple_model.v2 import Model, Attribute, Unset
+import pytest
+
+from simple_model.v2 import Model, Attribute, Unset, ModelError, BatchModelError
 from simple_model.helpers import list_type
 
 
@@ -239,4 +243,786 @@ def test_model_with_transformation_function():
 
     assert m.foo == 'abcdef'
 
+def test_attribute_name_takes_precedence_over_alias():
+    @Model()
+    @Attribute('foobar', type=str, alias='@foobar')
+    class AliasModel(object):
+        pass
+
+    m = AliasModel(**{'foobar': 'abc', '@foobar': 'def'})
+
+    assert m.foobar == 'abc'
+
+
+def test_model_passes_unknown_arguments_to_custom_init():
+    @Model()
+    @Attribute('foobar', type=str)
+    class InitModel(object):
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+    m = InitModel(foobar='abc', other=1)
+
+    assert m.foobar == 'abc'
+    assert m.kwargs == {'other': 1}
+
+
+def test_model_inheritance_chains_to_user_init_once():
+    calls = []
+
+    @Model()
+    @Attribute('foo', type=str)
+    class Super(object):
+        def __init__(self):
+            calls.append(self)
+
+    @Model()
+    @Attribute('bar', type=int)
+    class Child(Super):
+        pass
+
+    m = Child(foo='abc', bar='1')
+
+    assert m.foo == 'abc'
+    assert m.bar == 1
+    assert calls == [m]
+
+
+def test_model_with_slots():
+    @Model(slots=True)
+    @Attribute('foo', type=str)
+    @Attribute('bar', type=int, optional=True)
+    class SlotModel(object):
+        pass
+
+    m = SlotModel(foo='abc')
+
+    assert not hasattr(m, '__dict__')
+    assert set(SlotModel.__slots__) == {'_foo', '_bar'}
+
+    assert m.foo == 'abc'
+    assert m.bar is Unset
+
+    m.bar = '12'
+
+    assert m.bar == 12
+
+    del m.bar
+
+    assert m.bar is Unset
+    assert dict(m) == {'foo': 'abc', 'bar': Unset}
+
+
+def test_frozen_model_is_decided_at_decoration():
+    @Model(mutable=False)
+    @Attribute('foobar', type=str)
+    class FrozenModel(object):
+        pass
+
+    prop = FrozenModel.__dict__['foobar']
+
+    m = FrozenModel(foobar='abc')
+
+    assert FrozenModel.__dict__['foobar'] is prop
+
+    try:
+        del m.foobar
+        assert False, 'Attribute is deletable'
+    except AttributeError:
+        pass
+
+
+def test_frozen_model_is_hashable():
+    @Model(mutable=False)
+    @Attribute('foo', type=str)
+    @Attribute('bar', type=int, optional=True)
+    class FrozenModel(object):
+        pass
+
+    m1 = FrozenModel(foo='abc', bar=1)
+    m2 = FrozenModel(foo='abc', bar=1)
+    m3 = FrozenModel(foo='abc')
+
+    assert hash(m1) == hash(m2)
+    assert hash(m1) == m1.__hash_value__
+
+    assert {m1: 'value'}[m2] == 'value'
+    assert len({m1, m2, m3}) == 2
+
+
+def test_mutable_subclass_of_frozen_model():
+    @Model(mutable=False)
+    @Attribute('a', type=int)
+    class FrozenParent(object):
+        pass
+
+    @Model()
+    class Child(FrozenParent):
+        pass
+
+    c = Child(a=1)
+    c.a = '5'
+
+    assert c.a == 5
+
+    del c.a
+
+    assert c.a is Unset
+
+    assert hash(c) == object.__hash__(c)
+
+    with pytest.raises(AttributeError):
+        FrozenParent(a=1).a = 5
+
+
+def test_frozen_model_with_slots_is_hashable():
+    @Model(mutable=False, slots=True)
+    @Attribute('foo', type=str)
+    class FrozenModel(object):
+        pass
+
+    m = FrozenModel(foo='abc')
+
+    assert not hasattr(m, '__dict__')
+    assert hash(m) == hash(FrozenModel(foo='abc'))
+
+
+def test_frozen_model_hiding_unset_hashes_like_it_compares():
+    @Model(mutable=False, hide_unset=True)
+    @Attribute('foo', type=str, optional=True, nullable=True)
+    class FrozenModel(object):
+        pass
+
+    unset, null = FrozenModel(), FrozenModel(foo=None)
+
+    assert unset.foo is Unset and null.foo is None
+    assert unset == null
+    assert hash(unset) == hash(null)
+    assert len({unset, null}) == 1
+
+
+def test_model_schema_keeps_declaration_order():
+    @Model()
+    @Attribute('foo', type=str)
+    @Attribute('bar', type=str, alias='@bar')
+    @Attribute('baz', type=str)
+    class OrderedModel(object):
+        pass
+
+    schema = OrderedModel.__schema__
+
+    assert [a.name for a in schema] == ['foo', 'bar', 'baz']
+    assert schema['@bar'] is schema['bar']
+    assert schema.keys == ('@bar', 'baz', 'foo')
+
+    m = OrderedModel(foo='a', bar='b', baz='c')
+
+    assert m['@bar'] == 'b'
+    assert m['bar'] == 'b'
+    assert m.keys() == ['@bar', 'baz', 'foo']
+
+    try:
+        m['unknown']
+        assert False, 'found unknown key'
+    except KeyError:
+        pass
+
+
+def test_model_inheritance_does_not_change_parent_attributes():
+    @Model()
+    @Attribute('foo', type=str)
+    class Super(object):
+        pass
+
+    @Model()
+    @Attribute('foo', type=int)
+    @Attribute('bar', type=int)
+    class Child(Super):
+        pass
+
+    assert [a.name for a in Super.__schema__] == ['foo']
+    assert [a.name for a in Child.__schema__] == ['foo', 'bar']
+
+    assert Super(foo=1).foo == '1'
+    assert Child(foo='1', bar=2).foo == 1
+
+
+def test_model_to_dict():
+    @Model()
+    @Attribute('foobar', type=UUTModel, alias='@foobar')
+    @Attribute('foobars', type=list_type(UUTModel), optional=True)
+    @Attribute('other', type=lambda v: v, optional=True)
+    class StackedModel(object):
+        pass
+
+    s = StackedModel(foobar={'foo': 'abc'}, foobars=[{'foo': 'def'}], other=[UUTModel(foo='ghi')])
+
+    assert s.to_dict() == {
+        '@foobar': {'foo': 'abc', 'baz': 12},
+        'foobars': [{'foo': 'def', 'baz': 12}],
+        'other': [{'foo': 'ghi', 'baz': 12}],
+    }
+
+    assert s.to_dict(by_alias=False)['foobar'] == {'foo': 'abc', 'baz': 12}
+    assert s.to_dict(hide_unset=False)['@foobar'] == {'foo': 'abc', 'bar': Unset, 'baz': 12}
+
+    s = StackedModel(foobar={'foo': 'abc'})
+
+    assert s.to_dict() == {'@foobar': {'foo': 'abc', 'baz': 12}, 'foobars': Unset, 'other': Unset}
+    assert s.to_dict(hide_unset=True) == {'@foobar': {'foo': 'abc', 'baz': 12}}
+
+
+def test_model_to_dict_with_transformations():
+    @Model()
+    @Attribute('nested', type=UUTModel, transformation=lambda m: dict(m))
+    @Attribute('count', type=int, transformation=lambda n: [UUTModel(foo=str(n))])
+    class Transformed(object):
+        pass
+
+    t = Transformed(nested={'foo': 'abc'}, count=1)
+
+    assert t.to_dict() == {'nested': {'foo': 'abc', 'baz': 12}, 'count': [{'foo': '1', 'baz': 12}]}
+
+
+def test_model_to_json():
+    import json
+
+    m = UUTModel(foo='abc')
+
+    assert json.loads(m.to_json()) == {'foo': 'abc', 'baz': 12}
+    assert json.loads(m.to_json(hide_unset=False)) == {'foo': 'abc', 'bar': None, 'baz': 12}
+    assert m.to_json(sort_keys=True) == '{"baz": 12, "foo": "abc"}'
+
+
+def test_model_item_access_keeps_empty_strings():
+    m = UUTModel(foo='')
+
+    assert dict(m) == {'foo': '', 'baz': 12}
+
+
+def test_model_from_records():
+    records = [{'foo': 'abc'}, {'foo': 'def', 'baz': '1'}]
+
+    result = UUTModel.from_records(iter(records))
+
+    assert result == [UUTModel(**r) for r in records]
+    assert all(isinstance(m, UUTModel) for m in result)
+
+
+def test_model_from_records_reports_failed_records():
+    try:
+        UUTModel.from_records([{'foo': 'abc'}, {'baz': 'abc'}, {'foo': 'def'}, {}])
+        assert False, 'from_records did not raise'
+    except BatchModelError as e:
+        assert isinstance(e, ModelError)
+        assert [index for index, _ in e.args[1]] == [1, 3]
+        assert len(e.args[1][0][1].args[1]) == 2
+        assert '- record: 3' in str(e)
+
+
+def test_model_copies_only_mutable_values_by_default():
+    @Model(mutable=False)
+    @Attribute('foo', type=str)
+    class FrozenModel(object):
+        pass
+
+    @Model()
+    @Attribute('values', type=list)
+    @Attribute('frozen', type=FrozenModel, optional=True)
+    @Attribute('mutable', type=UUTModel, optional=True)
+    class CopyModel(object):
+        pass
+
+    values = [[1], [2]]
+    frozen = FrozenModel(foo='abc')
+    mutable = UUTModel(foo='abc')
+
+    m = CopyModel(values=values, frozen=frozen, mutable=mutable)
+
+    assert m.values == values
+    assert m.values is not values
+    assert m.values[0] is not values[0]
+
+    assert m.frozen is frozen
+    assert m.mutable == mutable
+    assert m.mutable is not mutable
+
+    m.values = values
+
+    assert m.values is not values
+
+
+def test_model_copy_policies():
+    values = [[1], [2]]
+
+    @Model(copy_policy='shallow')
+    @Attribute('values', type=list)
+    class ShallowModel(object):
+        pass
+
+    m = ShallowModel(values=values)
+
+    assert m.values is not values
+    assert m.values[0] is values[0]
+
+    @Model(copy_policy='none')
+    @Attribute('values', type=list)
+    class ReferenceModel(object):
+        pass
+
+    assert ReferenceModel(values=values).values is values
+
+    @Model(copy_policy='deep')
+    @Attribute('value', type=str)
+    class DeepModel(object):
+        pass
+
+    assert DeepModel(value='abc').value == 'abc'
+
+    try:
+        Model(copy_policy='unknown')
+        assert False, 'unknown copy policy accepted'
+    except ValueError:
+        pass
+
+
+def test_lazy_model_parses_on_first_access():
+    calls = []
+
+    def parse(value):
+        calls.append(value)
+        return int(value)
+
+    @Model(lazy=True)
+    @Attribute('foo', type=parse)
+    @Attribute('bar', type=parse, default=1)
+    class LazyModel(object):
+        pass
+
+    m = LazyModel(foo='12')
+
+    assert calls == []
+
+    assert m.foo == 12
+    assert m.foo == 12
+    assert calls == ['12']
+
+    assert m.to_dict() == {'foo': 12, 'bar': 1}
+    assert calls == ['12', 1]
+
+
+def test_plain_subclass_of_lazy_model():
+    @Model(lazy=True)
+    @Attribute('a', type=int)
+    class LazyParent(object):
+        pass
+
+    @Model()
+    @Attribute('b', type=int)
+    class Child(LazyParent):
+        pass
+
+    c = Child(a='1', b=2)
+    c.a = '5'
+    del c.b
+
+    assert (c.a, c.b) == (5, Unset)
+    assert not hasattr(c, '__raw__')
+
+
+def test_lazy_model_validate():
+    @Model(lazy=True)
+    @Attribute('foo', type=int)
+    @Attribute('bar', type=int)
+    class LazyModel(object):
+        pass
+
+    m = LazyModel(foo='abc')
+
+    try:
+        m.foo
+        assert False, 'invalid value did not raise'
+    except ModelError as e:
+        assert len(e.args[1]) == 1
+
+    try:
+        m.validate()
+        assert False, 'invalid values did not raise'
+    except ModelError as e:
+        assert [error.args[0].name for error in e.args[1]] == ['foo', 'bar']
+
+    m = LazyModel(foo='1', bar='2')
+    m.validate()
+
+    assert m.__raw__ == {}
+    assert (m.foo, m.bar) == (1, 2)
+
+
+def test_scalar_types_are_called_positionally(monkeypatch):
+    @Model()
+    @Attribute('foo', type=int)
+    @Attribute('bar', type=list_type(str), cache=2)
+    class Scalars(object):
+        pass
+
+    def construct(self, value):
+        raise AssertionError('construct was called for %s' % self.name)
+
+    monkeypatch.setattr(Attribute, 'construct', construct)
+
+    assert dict(Scalars(foo='1', bar=(1, 2))) == {'foo': 1, 'bar': ['1', '2']}
+
+
+def test_attribute_caches_conversions():
+    calls = []
+
+    def parse(value):
+        calls.append(value)
+        return str(value)
+
+    @Model()
+    @Attribute('foo', type=parse, cache=2)
+    class CacheModel(object):
+        pass
+
+    assert CacheModel(foo=1).foo == '1'
+    assert CacheModel(foo=1).foo == '1'
+    assert CacheModel(foo=True).foo == 'True'
+    assert CacheModel(foo=[1]).foo == '[1]'
+
+    assert calls == [1, True, [1]]
+
+    cache = CacheModel.__schema__['foo'].cache
+
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+@Model(slots=True)
+@Attribute('status', type=str, intern=True)
+@Attribute('tags', type=tuple, intern=2)
+class Interned(object):
+    pass
+
+
+def test_attribute_interns_values():
+    first = Interned(status=''.join(['o', 'k']), tags=['a', 'b'])
+    second = Interned(status=''.join(['o', 'k']), tags=['a', 'b'])
+
+    assert first.status is second.status
+    assert first.tags is second.tags
+    assert first == second
+
+    first.status = ''.join(['o', 'k'])
+
+    assert first.status is second.status
+
+    copied = pickle.loads(pickle.dumps(second))
+
+    assert copied.status is first.status
+    assert copied.tags is first.tags
+
+    Interned(status='ok', tags=['c'])
+
+    assert Interned(status='ok', tags=['d']).tags is not Interned(status='ok', tags=['d']).tags
+    assert len(Interned.__schema__['tags'].intern) == 2
+
+
 # vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4 fenc=utf-8
+
+
+def test_dict_of_model_with_list_of_models():
+    @Model()
+    @Attribute('foobar', type=list_type(UUTModel))
+    class Inner(object):
+        pass
+
+    @Model()
+    @Attribute('inner', type=Inner)
+    class Outer(object):
+        pass
+
+    o = Outer(inner={'foobar': [{'foo': 'abc'}]})
+
+    assert isinstance(dict(o)['inner'], dict)
+    assert dict(Inner(foobar=[{'foo': 'abc'}]))['foobar'] == [UUTModel(foo='abc')]
+
+
+PARSED = []
+
+
+def counted_int(value):
+    PARSED.append(value)
+    return int(value)
+
+
+@Model(lazy=True, slots=True, mutable=False)
+@Attribute('foo', type=counted_int)
+@Attribute('bar', type=counted_int, default=1)
+class PickledModel(object):
+    pass
+
+
+@Model(lazy=True)
+@Attribute('foo', type=int)
+@Attribute('bar', type=int, optional=True)
+class MutableLazyModel(object):
+    pass
+
+
+@Model()
+class PickledSubModel(UUTModel):
+    def __init__(self):
+        self.extra = 'extra'
+
+
+def test_pickling_lazy_model_keeps_assigned_values():
+    m = MutableLazyModel(foo='1', bar='2')
+    m.foo = 5
+    del m.bar
+
+    assert m.__raw__ == {}
+
+    for restored in (pickle.loads(pickle.dumps(m)), copy.copy(m), copy.deepcopy(m)):
+        assert restored.foo == 5
+        assert restored.bar is Unset
+
+
+def test_pickling_restores_values_without_parsing():
+    m = UUTModel(foo='abc', bar=1)
+    restored = pickle.loads(pickle.dumps(m))
+
+    assert restored == m
+    assert restored.bar == 1
+    assert restored.baz == 12
+
+    del PARSED[:]
+
+    lazy = PickledModel(foo='1', bar='2')
+
+    assert lazy.foo == 1
+    assert PARSED == ['1']
+
+    restored = pickle.loads(pickle.dumps(lazy, pickle.HIGHEST_PROTOCOL))
+
+    assert PARSED == ['1']
+    assert restored.foo == 1
+    assert restored.bar == 2
+    assert PARSED == ['1', '2']
+    assert restored == lazy
+    assert hash(restored) == hash(lazy)
+
+
+def test_pickling_keeps_instance_attributes_of_custom_init():
+    m = PickledSubModel(foo='abc')
+    restored = pickle.loads(pickle.dumps(m))
+
+    assert restored.extra == 'extra'
+    assert restored.foo == 'abc'
+    assert restored == m
+
+
+def test_check_validates_without_creating_a_model():
+    @Model(ignore_unknown=False)
+    @Attribute('foo', type=int, alias='Foo')
+    @Attribute('bar', type=list, default=[1])
+    @Attribute('baz', type=str, optional=True, transformation=lambda v: v.upper())
+    class Checked(object):
+        def __init__(self):
+            raise AssertionError('__init__ must not run')
+
+    assert Checked.check({'Foo': '1'}) == []
+    assert Checked.check({'foo': 1, 'baz': 'abc'}) == []
+
+    errors = Checked.check({'foo': 'x', 'bar': None, 'other': 1})
+
+    assert [(e.args[0].name if e.args[0] else None, e.args[1]) for e in errors] == [('foo', 'x'), (None, 1)]
+
+    payload = {'bar': [1, 2]}
+    Checked.check(payload)
+
+    assert payload == {'bar': [1, 2]}
+
+    assert [e.args[0].name for e in UUTModel.check({})] == ['foo']
+    assert [e.args[0] for e in UUTModel.check({'foo': 'abc', 'unknown': 1})] == [None]
+
+
+@Model(track_changes=True, slots=True)
+@Attribute('foo', type=str)
+@Attribute('bar', type=int, optional=True, alias='a/b')
+@Attribute('baz', type=list, default=[])
+class TrackedModel(object):
+    pass
+
+
+def test_change_tracking():
+    m = TrackedModel(foo='abc', bar=1)
+
+    assert m.changed_fields() == frozenset()
+    assert m.to_dict(changed_only=True) == {}
+
+    m.foo = 'def'
+    del m.bar
+
+    assert m.changed_fields() == frozenset(['foo', 'bar'])
+    assert m.to_dict(changed_only=True) == {'foo': 'def', 'a/b': Unset}
+    assert m.to_patch() == [
+        {'op': 'remove', 'path': '/a~1b'},
+        {'op': 'add', 'path': '/foo', 'value': 'def'},
+    ]
+    assert m.to_patch(by_alias=False)[0]['path'] == '/bar'
+
+    restored = pickle.loads(pickle.dumps(m))
+
+    assert restored.changed_fields() == m.changed_fields()
+
+    m.mark_clean()
+
+    assert m.changed_fields() == frozenset()
+    assert m.to_patch() == []
+    assert pickle.loads(pickle.dumps(m)).changed_fields() == frozenset()
+
+    with pytest.raises(ValueError):
+        UUTModel(foo='abc').to_dict(changed_only=True)
+
+
+def test_change_tracking_starts_after_custom_init():
+    @Model(track_changes=True)
+    @Attribute('foo', type=str)
+    class Tracked(object):
+        def __init__(self):
+            self.foo = self.foo.upper()
+
+    assert Tracked(foo='abc').changed_fields() == frozenset()
+    assert Tracked.from_records([{'foo': 'abc'}])[0].changed_fields() == frozenset()
+
+
+def test_plain_subclass_of_tracked_model():
+    @Model(track_changes=True)
+    @Attribute('a', type=int)
+    class TrackedParent(object):
+        pass
+
+    @Model()
+    class Child(TrackedParent):
+        pass
+
+    c = Child(a=1)
+    c.a = 5
+    del c.a
+
+    assert c.a is Unset
+    assert not hasattr(c, '__changed__')
+
+
+class Compared(object):
+    comparisons = 0
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        Compared.comparisons += 1
+        return self.value == other.value
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def test_equality_stops_at_first_difference():
+    @Model(copy_policy='none')
+    @Attribute('foo', type=int)
+    @Attribute('bar', type=Compared)
+    @Attribute('nested', type=UUTModel, optional=True)
+    class Data(object):
+        pass
+
+    Compared.comparisons = 0
+
+    assert Data(foo=1, bar=Compared(1)) != Data(foo=2, bar=Compared(1))
+    assert Compared.comparisons == 0
+
+    assert Data(foo=1, bar=Compared(1)) == Data(foo=1, bar=Compared(1))
+    assert Compared.comparisons == 1
+
+    value = Compared(1)
+
+    assert Data(foo=1, bar=value) == Data(foo=1, bar=value)
+    assert Compared.comparisons == 1
+
+    first = Data(foo=1, bar=value, nested={'foo': 'abc'})
+
+    assert first == Data(foo=1, bar=value, nested={'foo': 'abc'})
+    assert first != Data(foo=1, bar=value, nested={'foo': 'abd'})
+    assert first != Data(foo=1, bar=value)
+    assert first != dict(first)
+
+
+def test_equality_of_hidden_unset_values_and_subclasses():
+    @Model(hide_unset=True)
+    @Attribute('foo', type=int, optional=True, nullable=True)
+    class Hiding(object):
+        pass
+
+    assert Hiding(foo=None) == Hiding()
+
+    @Model(hide_unset=True)
+    @Attribute('extra', type=int, optional=True)
+    class Extended(UUTModel):
+        pass
+
+    # the == operator prefers the __eq__ of the subclass, which rejects instances of its parent
+    assert UUTModel(foo='abc').__eq__(Extended(foo='abc'))
+    assert not UUTModel(foo='abc').__eq__(Extended(foo='abc', extra=1))
+    assert Extended(foo='abc') != UUTModel(foo='abc')
+
+
+def test_contains():
+    m = UUTModel(foo='abc')
+
+    assert 'foo' in m
+    assert 'bar' not in m
+
+
+def test_fail_fast_and_error_budget():
+    calls = []
+
+    def counted(value):
+        calls.append(value)
+        return int(value)
+
+    def make(**options):
+        @Model(ignore_unknown=False, **options)
+        @Attribute('foo', type=counted)
+        @Attribute('bar', type=counted)
+        @Attribute('baz', type=counted)
+        class Budgeted(object):
+            pass
+
+        return Budgeted
+
+    payload = dict(foo='x', bar='y', baz='z', **dict(('unknown%d' % i, i) for i in range(1000)))
+
+    with pytest.raises(ModelError) as e:
+        make(fail_fast=True)(**payload)
+
+    assert [error.args[0].name for error in e.value.args[1]] == ['foo']
+    assert calls == ['x']
+
+    budgeted = make(max_errors=5)
+
+    with pytest.raises(ModelError) as e:
+        budgeted(**payload)
+
+    assert len(e.value.args[1]) == 5
+    assert [error.args[0] for error in e.value.args[1]][3:] == [None, None]
+
+    with pytest.raises(BatchModelError) as e:
+        budgeted.from_records([{'foo': 'x', 'bar': 'y', 'baz': 'z'}, {'foo': 1, 'bar': 2, 'baz': 3}, payload])
+
+    assert [(index, len(error.args[1])) for index, error in e.value.args[1]] == [(0, 3), (2, 5)]
+
+    assert len(make(fail_fast=True).check(payload)) == 1
+    assert len(budgeted.check(payload)) == 5
+
+    with pytest.raises(ValueError):
+        Model(max_errors=0)
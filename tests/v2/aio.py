@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+
+from simple_model.v2 import Model, Attribute, ModelError, BatchModelError
+
+
+async def known_id(value):
+    await asyncio.sleep(0.01)
+
+    if value == 'unknown':
+        raise ValueError('unknown id')
+
+    return value.upper()
+
+
+async def suffixed(value):
+    await asyncio.sleep(0)
+    return value + '!'
+
+
+@Model(ignore_unknown=False)
+@Attribute('id', type=known_id)
+@Attribute('other_id', type=known_id, alias='otherId')
+@Attribute('name', type=str, transformation=suffixed)
+@Attribute('count', type=int, default=0)
+class Record(object):
+    pass
+
+
+def test_acreate_awaits_types_and_transformations():
+    record = asyncio.run(Record.acreate(id='a', otherId='b', name='c'))
+
+    assert isinstance(record, Record)
+    assert dict(record) == {'id': 'A', 'otherId': 'B', 'name': 'c!', 'count': 0}
+
+
+def test_synchronous_creation_is_refused():
+    for create in (
+        lambda: Record(id='a', otherId='b', name='c'),
+        lambda: Record.from_records([{'id': 'a', 'otherId': 'b', 'name': 'c'}]),
+        lambda: Record.check({'id': 'a', 'otherId': 'b', 'name': 'c'}),
+    ):
+        with pytest.raises(TypeError, match='id, other_id, name.*acreate'):
+            create()
+
+    record = asyncio.run(Record.acreate(id='a', otherId='b', name='c'))
+
+    with pytest.raises(TypeError, match='acreate'):
+        record.id = 'b'
+
+    record.count = '2'
+
+    assert record.count == 2
+
+
+def test_acreate_runs_attributes_concurrently():
+    async def create():
+        start = asyncio.get_running_loop().time()
+        await Record.acreate(id='a', other_id='b', name='c')
+        return asyncio.get_running_loop().time() - start
+
+    assert asyncio.run(create()) < 0.02
+
+
+def test_acreate_collects_errors():
+    with pytest.raises(ModelError) as e:
+        asyncio.run(Record.acreate(id='unknown', other_id='b', name='c', count='x', foo=1))
+
+    assert sorted(error.args[0].name for error in e.value.args[1] if error.args[0]) == ['count', 'id']
+    assert 'Unknown attribute "foo"' in str(e.value)
+
+
+def test_acreate_many_keeps_order_and_indices():
+    records = [{'id': str(i), 'other_id': 'b', 'name': 'c'} for i in range(20)]
+
+    instances = asyncio.run(Record.acreate_many(records, concurrency=3))
+
+    assert [r.id for r in instances] == [str(i) for i in range(20)]
+
+    records[5]['id'] = 'unknown'
+    records[11]['count'] = 'x'
+
+    with pytest.raises(BatchModelError) as e:
+        asyncio.run(Record.acreate_many(iter(records), concurrency=3))
+
+    assert [index for index, _ in e.value.args[1]] == [5, 11]
+
+
+def test_coroutine_types_can_not_be_cached():
+    with pytest.raises(ValueError):
+        Attribute('id', type=known_id, cache=10)